@@ -0,0 +1,226 @@
+"""Двухуровневый кеш: небольшой LRU в процессе перед общим кешем.
+
+Общий кеш (файлы, Redis, memcached) задаётся отдельным алиасом
+в CACHES и указывается в OPTIONS['SHARED']. Прочитанные из него
+значения держатся в памяти процесса не дольше LOCAL_TIMEOUT секунд,
+записей не больше LOCAL_MAX_ENTRIES. Ключи с префиксами из
+LOCAL_BYPASS (счётчики поколений, блокировки и другие изменяемые
+значения) всегда читаются из кеша OPTIONS['COUNTERS'] (по умолчанию
+тот же общий), чтобы все процессы видели изменения сразу. Этому кешу
+нужны атомарные add и incr и отсутствие вытеснения. Остальные ключи
+в проекте версионированы поколениями и после записи не меняются,
+поэтому локальная копия не устаревает.
+"""
+import fcntl
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+from core.perf.metrics import record_cache
+
+DEFAULT_LOCAL_TIMEOUT = 60
+DEFAULT_LOCAL_MAX_ENTRIES = 500
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        self.counters_alias = options.get('COUNTERS', self.shared_alias)
+        self.local_timeout = options.get('LOCAL_TIMEOUT',
+                                         DEFAULT_LOCAL_TIMEOUT)
+        self.local_max_entries = options.get('LOCAL_MAX_ENTRIES',
+                                             DEFAULT_LOCAL_MAX_ENTRIES)
+        self.local_bypass = tuple(options.get('LOCAL_BYPASS', ()))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    @property
+    def counters(self):
+        return caches[self.counters_alias]
+
+    def _is_local(self, key):
+        return not key.startswith(self.local_bypass)
+
+    def _backend(self, key):
+        return self.shared if self._is_local(key) else self.counters
+
+    def _split(self, keys):
+        """Делит ключи между общим кешем и кешем счётчиков."""
+        shared, counters = [], []
+        for key in keys:
+            (shared if self._is_local(key) else counters).append(key)
+        return ((self.shared, shared), (self.counters, counters))
+
+    def _local_get(self, key, version):
+        local_key = self.make_key(key, version)
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._local[local_key]
+                return None
+            self._local.move_to_end(local_key)
+        return entry
+
+    def _local_set(self, key, value, timeout, version):
+        if not self._is_local(key):
+            return
+        local_timeout = self.local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            local_timeout = min(local_timeout, timeout)
+        if local_timeout <= 0:
+            self._local_delete(key, version)
+            return
+        # Храним копию: кешированные ответы меняют по дороге к клиенту.
+        entry = (time.monotonic() + local_timeout,
+                 pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        local_key = self.make_key(key, version)
+        with self._lock:
+            self._local[local_key] = entry
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key, version):
+        with self._lock:
+            self._local.pop(self.make_key(key, version), None)
+
+    def get(self, key, default=None, version=None):
+        if self._is_local(key):
+            entry = self._local_get(key, version)
+            if entry is not None:
+                record_cache(1, 0)
+                return pickle.loads(entry[1])
+        sentinel = object()
+        value = self._backend(key).get(key, sentinel, version=version)
+        if value is sentinel:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        self._local_set(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = {}
+        missing = []
+        for key in keys:
+            entry = self._local_get(key, version) if self._is_local(
+                key) else None
+            if entry is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(entry[1])
+        for backend, backend_keys in self._split(missing):
+            if not backend_keys:
+                continue
+            shared_found = backend.get_many(backend_keys, version=version)
+            for key, value in shared_found.items():
+                self._local_set(key, value, DEFAULT_TIMEOUT, version)
+            found.update(shared_found)
+        record_cache(len(found), len(keys) - len(found))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._backend(key).set(key, value, timeout, version=version)
+        self._local_set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = []
+        for backend, backend_keys in self._split(data):
+            if backend_keys:
+                failed.extend(backend.set_many(
+                    {key: data[key] for key in backend_keys}, timeout,
+                    version=version) or [])
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._backend(key).add(key, value, timeout, version=version)
+        if added:
+            self._local_set(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._backend(key).touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(key, version)
+        return self._backend(key).delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._local_delete(key, version)
+        for backend, backend_keys in self._split(keys):
+            if backend_keys:
+                backend.delete_many(backend_keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._is_local(key) and self._local_get(key, version):
+            return True
+        return self._backend(key).has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self._backend(key).incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self._backend(key).decr(key, delta, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+        if self.counters_alias != self.shared_alias:
+            self.counters.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+        if self.counters_alias != self.shared_alias:
+            self.counters.close(**kwargs)
+
+
+class LockedFileCache(FileBasedCache):
+    """Файловый кеш счётчиков поколений и блокировок.
+
+    add и incr выполняются под flock, поэтому атомарны и между
+    процессами. Записи не вытесняются: ключей здесь немного, а
+    потерянный счётчик поколения откатил бы кеш к старым данным.
+    """
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self._dir, exist_ok=True)
+        with open(os.path.join(self._dir, 'lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # decr из BaseCache вызывает incr, поэтому отдельно не нужен.
+        with self._locked():
+            return super().incr(key, delta, version=version)
+
+    def _cull(self):
+        pass
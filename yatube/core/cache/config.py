@@ -0,0 +1,87 @@
+"""Настройки кеша из переменных окружения.
+
+CACHE_BACKEND выбирает общий кеш: locmem (по умолчанию, только для
+разработки и тестов в одном процессе), redis (нужен django-redis),
+memcached или file (каталог CACHE_LOCATION задаётся обязательно).
+Перед общим кешем всегда стоит core.cache.backends.TwoTierCache
+с локальным LRU.
+
+Счётчики поколений, блокировки и другие ключи из LOCAL_BYPASS лежат
+в отдельном алиасе counters. Там add и incr атомарны и записи
+не вытесняются: в redis и memcached это тот же сервер, для locmem
+отдельный кеш без ограничения числа записей, для file —
+core.cache.backends.LockedFileCache в подкаталоге counters.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+SHARED_BACKENDS = {
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+DEFAULT_LOCATIONS = {
+    'redis': 'redis://127.0.0.1:6379/1',
+    'memcached': '127.0.0.1:11211',
+    'locmem': 'yatube',
+}
+# Изменяемые ключи, которые нельзя держать в памяти процесса.
+LOCAL_BYPASS = ('posts:generation:', 'lock:', 'perf:')
+# Столько записей в кеше счётчиков не бывает, поэтому они не вытесняются.
+COUNTERS_MAX_ENTRIES = 10 ** 9
+
+
+def get_location(backend, environ):
+    location = environ.get('CACHE_LOCATION', DEFAULT_LOCATIONS.get(backend))
+    if location is None:
+        raise ImproperlyConfigured(
+            f'Для CACHE_BACKEND={backend} нужен CACHE_LOCATION')
+    return location
+
+
+def get_counters_cache(backend, location, key_prefix):
+    if backend == 'file':
+        return {
+            'BACKEND': 'core.cache.backends.LockedFileCache',
+            'LOCATION': os.path.join(location, 'counters'),
+            'KEY_PREFIX': key_prefix,
+        }
+    counters = {
+        'BACKEND': SHARED_BACKENDS[backend],
+        'LOCATION': location,
+        'KEY_PREFIX': key_prefix,
+    }
+    if backend == 'locmem':
+        counters['LOCATION'] = f'{location}:counters'
+        counters['OPTIONS'] = {'MAX_ENTRIES': COUNTERS_MAX_ENTRIES}
+    return counters
+
+
+def get_caches(environ=os.environ):
+    """Словарь для CACHES по переменным окружения."""
+    backend = environ.get('CACHE_BACKEND', 'locmem')
+    if backend not in SHARED_BACKENDS:
+        raise ImproperlyConfigured(f'Неизвестный CACHE_BACKEND: {backend}')
+    location = get_location(backend, environ)
+    key_prefix = environ.get('CACHE_KEY_PREFIX', 'yatube')
+    return {
+        'default': {
+            'BACKEND': 'core.cache.backends.TwoTierCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'COUNTERS': 'counters',
+                'LOCAL_TIMEOUT': int(environ.get('CACHE_LOCAL_TIMEOUT', 60)),
+                'LOCAL_MAX_ENTRIES': int(
+                    environ.get('CACHE_LOCAL_MAX_ENTRIES', 500)),
+                'LOCAL_BYPASS': LOCAL_BYPASS,
+            },
+        },
+        'shared': {
+            'BACKEND': SHARED_BACKENDS[backend],
+            'LOCATION': location,
+            'KEY_PREFIX': key_prefix,
+        },
+        'counters': get_counters_cache(backend, location, key_prefix),
+    }
@@ -0,0 +1,42 @@
+"""Защита от одновременного пересчёта одного ключа кеша.
+
+Когда дорогой ключ пропадает из кеша (например, после смены поколения
+ленты), его пересчитывает только тот, кто первым взял блокировку.
+Остальные недолго ждут готового значения, а не считают его заново
+всем потоком запросов.
+"""
+import time
+
+LOCK_PREFIX = 'lock:'
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 2.0
+POLL_INTERVAL = 0.05
+
+
+def get_or_compute(cache, key, compute, timeout, should_cache=None,
+                   lock_timeout=LOCK_TIMEOUT, wait_timeout=WAIT_TIMEOUT):
+    """Значение ключа; при промахе его вычисляет compute().
+
+    should_cache(value) решает, сохранять ли результат. Если значение
+    не появилось за wait_timeout секунд, ожидающий считает его сам,
+    не сохраняя.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_key = LOCK_PREFIX + key
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = compute()
+            if should_cache is None or should_cache(value):
+                cache.set(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+    deadline = time.monotonic() + wait_timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return compute()
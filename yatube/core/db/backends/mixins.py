@@ -0,0 +1,27 @@
+class HealthCheckMixin:
+    """Проверяет переиспользуемое соединение перед первым запросом.
+
+    Постоянное соединение могло оборваться между HTTP-запросами
+    (перезапуск базы, таймаут на балансировщике). Если в настройках
+    базы задан HEALTH_CHECKS, перед первым запросом после
+    close_old_connections соединение проверяется и при необходимости
+    открывается заново, а не падает на запросе пользователя.
+    """
+    health_check_done = False
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (self.connection is not None
+                and not self.health_check_done
+                and self.settings_dict.get('HEALTH_CHECKS')):
+            if not self.in_atomic_block and not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
@@ -0,0 +1,66 @@
+"""PostgreSQL с пулом соединений внутри процесса.
+
+Вместо закрытия соединение возвращается в пул размером POOL_SIZE
+и достаётся оттуда следующим запросом любого потока. Незавершённая
+транзакция перед возвратом откатывается, оборванные соединения
+отбрасываются.
+"""
+import queue
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from core.db.backends.mixins import HealthCheckMixin
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, size):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = queue.LifoQueue(maxsize=size)
+        return _pools[alias]
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict['POOL_SIZE'])
+
+    def get_new_connection(self, conn_params):
+        while True:
+            try:
+                connection = self.pool.get_nowait()
+            except queue.Empty:
+                return super().get_new_connection(conn_params)
+            if self._is_reusable(connection):
+                return connection
+            connection.close()
+
+    def _is_reusable(self, connection):
+        if connection.closed:
+            return False
+        if not self.settings_dict.get('HEALTH_CHECKS'):
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except base.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        try:
+            if connection.closed:
+                return
+            status = connection.get_transaction_status()
+            if status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            self.pool.put_nowait(connection)
+        except (queue.Full, base.Database.Error):
+            connection.close()
@@ -0,0 +1,22 @@
+"""SQLite, настроенный для нескольких процессов и потоков.
+
+На каждое соединение выполняются PRAGMA из настройки PRAGMAS:
+WAL не даёт чтению блокировать запись, busy_timeout заставляет
+ждать блокировку вместо ошибки «database is locked». Транзакции
+начинаются с BEGIN IMMEDIATE: блокировка на запись берётся сразу,
+а не при первой записи, когда SQLite уже не может подождать и
+возвращает SQLITE_BUSY.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict.get('PRAGMAS') or {}
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
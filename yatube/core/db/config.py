@@ -0,0 +1,93 @@
+"""Настройки базы данных из переменных окружения.
+
+DB_ENGINE выбирает sqlite (по умолчанию) или postgresql. SQLite
+подключается через core.db.backends.sqlite3 с WAL и остальными
+PRAGMA из SQLITE_PRAGMAS, PostgreSQL — с постоянными соединениями,
+проверкой соединения перед повторным использованием и, если задан
+DB_POOL_SIZE, с пулом соединений внутри процесса. DB_REPLICA_HOSTS
+перечисляет через запятую хосты реплик PostgreSQL.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+DEFAULT_CONN_MAX_AGE = 60
+
+
+def _flag(value):
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def _sqlite(environ, base_dir):
+    pragmas = dict(SQLITE_PRAGMAS)
+    if environ.get('DB_SQLITE_BUSY_TIMEOUT'):
+        pragmas['busy_timeout'] = int(environ['DB_SQLITE_BUSY_TIMEOUT'])
+    if environ.get('DB_SQLITE_MMAP_SIZE'):
+        pragmas['mmap_size'] = int(environ['DB_SQLITE_MMAP_SIZE'])
+    return {
+        'ENGINE': 'core.db.backends.sqlite3',
+        'NAME': environ.get('DB_NAME',
+                            os.path.join(base_dir, 'db.sqlite3')),
+        'CONN_MAX_AGE': int(environ.get('DB_CONN_MAX_AGE',
+                                        DEFAULT_CONN_MAX_AGE)),
+        'PRAGMAS': pragmas,
+    }
+
+
+def _postgresql(environ):
+    database = {
+        'ENGINE': 'core.db.backends.postgresql',
+        'NAME': environ.get('DB_NAME', 'yatube'),
+        'USER': environ.get('DB_USER', 'postgres'),
+        'PASSWORD': environ.get('DB_PASSWORD', ''),
+        'HOST': environ.get('DB_HOST', 'localhost'),
+        'PORT': environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(environ.get('DB_CONN_MAX_AGE',
+                                        DEFAULT_CONN_MAX_AGE)),
+        'HEALTH_CHECKS': _flag(environ.get('DB_HEALTH_CHECKS', '1')),
+        'OPTIONS': {
+            'connect_timeout': int(environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
+    }
+    pool_size = int(environ.get('DB_POOL_SIZE', 0))
+    if pool_size:
+        # Соединения возвращаются в пул в конце запроса, постоянные
+        # соединения Django поверх пула не нужны.
+        database.update(
+            ENGINE='core.db.backends.postgresql_pool',
+            CONN_MAX_AGE=0,
+            POOL_SIZE=pool_size,
+        )
+    return database
+
+
+def get_database(environ=os.environ, base_dir=''):
+    """Словарь для DATABASES['default'] по переменным окружения."""
+    engine = environ.get('DB_ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        return _sqlite(environ, base_dir)
+    if engine in ('postgresql', 'postgres'):
+        return _postgresql(environ)
+    raise ImproperlyConfigured(f'Неизвестный DB_ENGINE: {engine}')
+
+
+def get_replicas(environ, primary):
+    """Базы replica_1, replica_2... с настройками основной базы."""
+    hosts = [host.strip()
+             for host in environ.get('DB_REPLICA_HOSTS', '').split(',')
+             if host.strip()]
+    if hosts and 'postgresql' not in primary['ENGINE']:
+        raise ImproperlyConfigured('Реплики поддерживаются только '
+                                   'для PostgreSQL.')
+    return {
+        f'replica_{number}': dict(primary, HOST=host,
+                                  TEST={'MIRROR': 'default'})
+        for number, host in enumerate(hosts, start=1)
+    }
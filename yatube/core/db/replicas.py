@@ -0,0 +1,106 @@
+"""Чтение с реплик для представлений, помеченных read_from_replica.
+
+Реплики перечислены в настройке DATABASE_REPLICAS. Запись всегда идёт
+в default. Чтобы пользователь сразу видел свои изменения, после
+запроса с записью ReplicaStickinessMiddleware ставит ему cookie, и
+следующие DATABASE_REPLICA_STICKY_SECONDS секунд его чтение идёт
+с основной базы.
+
+Реплика может отставать на те же несколько секунд, поэтому страница,
+прочитанная с неё, кешируется и получает ETag только на это время:
+иначе устаревшие данные закрепились бы под новым поколением кеша
+до следующей записи.
+"""
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+
+DEFAULT_DATABASE = 'default'
+DEFAULT_STICKY_SECONDS = 5
+STICKY_COOKIE = 'read_primary'
+
+_state = threading.local()
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS',
+                   DEFAULT_STICKY_SECONDS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'replica', None)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в default.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+def choose_replica(request):
+    """Реплика для чтения в этом запросе или None для основной базы."""
+    replicas = get_replicas()
+    if not replicas or request.method not in ('GET', 'HEAD'):
+        return None
+    if STICKY_COOKIE in request.COOKIES:
+        return None
+    return random.choice(replicas)
+
+
+def reading_from_replica():
+    """Идёт ли чтение текущего запроса с реплики."""
+    return getattr(_state, 'replica', None) is not None
+
+
+def replica_lag_window():
+    """Номер текущего окна длиной в допустимое отставание реплики.
+
+    Пока номер не сменился, данные с реплики можно считать свежими.
+    """
+    return int(time.time() // get_sticky_seconds())
+
+
+def read_from_replica(view):
+    """Выполняет чтение представления на случайной реплике."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        replica = choose_replica(request)
+        if replica is None:
+            return view(request, *args, **kwargs)
+        _state.replica = replica
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _state.replica = None
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """Отправляет чтение на основную базу сразу после записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.wrote = False
+        response = self.get_response(request)
+        if _state.wrote and get_replicas():
+            seconds = get_sticky_seconds()
+            response.set_cookie(STICKY_COOKIE, '1', max_age=seconds,
+                                httponly=True, samesite='Lax')
+        return response
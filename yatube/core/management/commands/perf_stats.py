@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.perf.stats import collect, reset_all, summarize
+
+COLUMNS = ('view', 'requests', 'p50_ms', 'p95_ms', 'p99_ms', 'avg_ms',
+           'queries', 'db_ms', 'cache_hit_rate', 'template_ms',
+           'response_kib')
+
+
+class Command(BaseCommand):
+    help = ('Выводит сводку замеров производительности по представлениям, '
+            'собранную всеми процессами сайта.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'views', nargs='*',
+            help='Какие представления показать, по умолчанию все.'
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Вывести JSON вместо таблицы.'
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить статистику после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        rows = summarize(collect())
+        if options['views']:
+            rows = [row for row in rows if row['view'] in options['views']]
+        if options['json']:
+            self.stdout.write(json.dumps(rows, ensure_ascii=False, indent=2))
+        else:
+            self.stdout.write('\t'.join(COLUMNS))
+            for row in rows:
+                self.stdout.write('\t'.join(
+                    '-' if row[column] is None else str(row[column])
+                    for column in COLUMNS))
+        if options['reset']:
+            reset_all()
+            self.stdout.write(self.style.SUCCESS('Статистика обнулена'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.perf.profiler import get_header, make_token
+
+
+class Command(BaseCommand):
+    help = ('Выдаёт подписанный заголовок, с которым запрос к сайту '
+            'будет профилирован. Заголовок действует '
+            'PROFILING_TOKEN_MAX_AGE секунд.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{get_header()}: {make_token()}')
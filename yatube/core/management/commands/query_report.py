@@ -0,0 +1,92 @@
+import glob
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.perf.queries import DUPLICATE, SLOW
+
+COLUMNS = ('kind', 'view', 'template', 'code', 'seen', 'max_count',
+           'max_total', 'max_ms', 'sql')
+SQL_PREVIEW_LENGTH = 120
+
+
+def read_entries(path):
+    """Записи журнала вместе с ротированными копиями, старые первыми."""
+    paths = sorted(glob.glob(f'{glob.escape(path)}.*'), reverse=True)
+    paths.append(path)
+    for log_path in paths:
+        try:
+            with open(log_path, encoding='utf-8') as log_file:
+                for line in log_file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def aggregate(entries):
+    """Сводит одинаковые находки: вид, представление, место и SQL."""
+    groups = {}
+    for entry in entries:
+        key = (entry['kind'], entry['view'], entry['template'],
+               entry['code'], entry['sql'])
+        row = groups.setdefault(key, {
+            'kind': entry['kind'], 'view': entry['view'],
+            'template': entry['template'], 'code': entry['code'],
+            'sql': entry['sql'], 'seen': 0, 'max_count': None,
+            'max_total': None, 'max_ms': None,
+        })
+        row['seen'] += 1
+        for field, value in (('max_count', entry.get('count')),
+                             ('max_total', entry.get('total')),
+                             ('max_ms', entry.get('duration_ms'))):
+            if value is not None:
+                row[field] = max(row[field] or 0, value)
+    return sorted(groups.values(), key=lambda row: row['seen'], reverse=True)
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала медленных и повторяющихся запросов: '
+            'что, откуда и как часто.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=getattr(settings, 'QUERY_LOG_FILE', None),
+            help='Файл журнала, по умолчанию QUERY_LOG_FILE.'
+        )
+        parser.add_argument(
+            '--kind', choices=(SLOW, DUPLICATE),
+            help='Показать только медленные или только повторы.'
+        )
+        parser.add_argument(
+            '--view', action='append', dest='views',
+            help='Показать только эти представления.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=50,
+            help='Сколько строк вывести.'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Завершиться ошибкой, если в журнале что-то есть.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['log']:
+            raise CommandError('Не задан QUERY_LOG_FILE или --log')
+        rows = aggregate(
+            entry for entry in read_entries(options['log'])
+            if (not options['kind'] or entry['kind'] == options['kind'])
+            and (not options['views'] or entry['view'] in options['views'])
+        )
+        self.stdout.write('\t'.join(COLUMNS))
+        for row in rows[:options['limit']]:
+            row['sql'] = row['sql'][:SQL_PREVIEW_LENGTH]
+            self.stdout.write('\t'.join(
+                '-' if row[column] is None else str(row[column])
+                for column in COLUMNS))
+        if options['check'] and rows:
+            raise CommandError(f'Найдено проблемных запросов: {len(rows)}')
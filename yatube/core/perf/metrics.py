@@ -0,0 +1,57 @@
+"""Замеры одного запроса.
+
+PerformanceMiddleware заводит RequestMetrics на время запроса, а
+обёртка выполнения запросов к базе, кеш и шаблонный движок дописывают
+в него свои числа через current_metrics(). Если запрос не попал
+в выборку, current_metrics() возвращает None и замеров нет.
+"""
+import threading
+import time
+
+_state = threading.local()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall_seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.response_bytes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+    def finish(self, response):
+        self.wall_seconds = time.perf_counter() - self.started
+        if not response.streaming:
+            self.response_bytes = len(response.content)
+
+
+def current_metrics():
+    return getattr(_state, 'metrics', None)
+
+
+def activate(metrics):
+    _state.metrics = metrics
+
+
+def deactivate():
+    _state.metrics = None
+
+
+def record_cache(hits, misses):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
@@ -0,0 +1,64 @@
+"""Замеры производительности выборки запросов.
+
+Доля запросов, заданная PERFORMANCE_SAMPLE_RATE, проходит с замерами:
+время ответа, число и время запросов к базе, попадания в кеш, время
+отрисовки шаблонов и размер ответа. Они уходят клиенту в заголовке
+Server-Timing и копятся в гистограммах core.perf.stats. Остальные
+запросы проходят без замеров, это стоит одного вызова random().
+"""
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics as request_metrics
+from .stats import stats
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+def get_sample_rate():
+    return getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 0)
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED_VIEW
+    return match.view_name
+
+
+def server_timing(metrics):
+    return ', '.join((
+        f'total;dur={metrics.wall_seconds * 1000:.1f}',
+        f'db;dur={metrics.db_seconds * 1000:.1f};'
+        f'desc="{metrics.queries} queries"',
+        f'cache;desc="{metrics.cache_hits} hits, '
+        f'{metrics.cache_misses} misses"',
+        f'tpl;dur={metrics.template_seconds * 1000:.1f}',
+    ))
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = get_sample_rate()
+        if sample_rate <= 0 or random.random() >= sample_rate:
+            return self.get_response(request)
+        metrics = request_metrics.RequestMetrics()
+        request_metrics.activate(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            request_metrics.deactivate()
+        metrics.finish(response)
+        response['Server-Timing'] = server_timing(metrics)
+        stats.record(get_view_name(request), metrics)
+        stats.publish_if_due()
+        return response
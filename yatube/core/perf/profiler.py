@@ -0,0 +1,158 @@
+"""Выборочный статистический профилировщик запросов.
+
+Профилируется каждый PROFILING_ONE_IN-й запрос в среднем (0 — ни один)
+и любой запрос с подписанным заголовком PROFILING_HEADER, который
+выдаёт команда profile_token. Пока запрос выполняется, отдельный поток
+каждые PROFILING_INTERVAL секунд снимает стек потока запроса через
+sys._current_frames(). Стеки дописываются в файл
+PROFILING_DIR/<представление>.folded в свёрнутом формате
+(«кадр;кадр;кадр число»), который понимают flamegraph.pl и speedscope.
+
+Время считается по настенным часам: ожидание базы видно как кадры
+драйвера базы.
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.core import signing
+
+from .middleware import get_view_name
+
+DEFAULT_INTERVAL = 0.005
+DEFAULT_TOKEN_MAX_AGE = 60 * 60
+DEFAULT_HEADER = 'X-Yatube-Profile'
+TOKEN_SALT = 'core.perf.profiler'
+SAMPLES_HEADER = 'X-Profile-Samples'
+
+
+def get_one_in():
+    return getattr(settings, 'PROFILING_ONE_IN', 0)
+
+
+def get_interval():
+    return getattr(settings, 'PROFILING_INTERVAL', DEFAULT_INTERVAL)
+
+
+def get_directory():
+    return getattr(settings, 'PROFILING_DIR',
+                   os.path.join(tempfile.gettempdir(), 'yatube-profiles'))
+
+
+def get_header():
+    return getattr(settings, 'PROFILING_HEADER', DEFAULT_HEADER)
+
+
+def make_token():
+    return signing.dumps('profile', salt=TOKEN_SALT)
+
+
+def has_valid_token(request):
+    meta_name = 'HTTP_' + get_header().upper().replace('-', '_')
+    token = request.META.get(meta_name)
+    if not token:
+        return False
+    max_age = getattr(settings, 'PROFILING_TOKEN_MAX_AGE',
+                      DEFAULT_TOKEN_MAX_AGE)
+    try:
+        signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def should_profile(request):
+    one_in = get_one_in()
+    if one_in > 0 and random.random() * one_in < 1:
+        return True
+    return has_valid_token(request)
+
+
+@lru_cache(maxsize=1024)
+def _short_filename(filename):
+    """Путь от каталога проекта или от каталога из sys.path."""
+    for path in [settings.BASE_DIR] + sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path + os.sep):
+            return os.path.relpath(filename, path)
+    return filename
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return (f'{code.co_name} '
+            f'({_short_filename(code.co_filename)}:{frame.f_lineno})')
+
+
+def collapse(frame, stop_frame=None):
+    """Стек от внешнего кадра к внутреннему одной строкой через «;»."""
+    labels = []
+    while frame is not None and frame is not stop_frame:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Снимает стеки одного потока с заданным интервалом."""
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = get_interval() if interval is None else interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='yatube-profiler')
+        self._stop_frame = None
+
+    def __enter__(self):
+        # Кадры выше точки входа одинаковы у всех запросов, их не пишем.
+        self._stop_frame = sys._getframe(1).f_back
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame, self._stop_frame)] += 1
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+
+def write_stacks(view_name, stacks):
+    """Дописывает стеки в файл представления одним вызовом write."""
+    if not stacks:
+        return None
+    directory = get_directory()
+    os.makedirs(directory, exist_ok=True)
+    filename = view_name.replace(':', '.').replace(os.sep, '_')
+    path = os.path.join(directory, f'{filename}.folded')
+    data = ''.join(f'{stack} {count}\n' for stack, count in stacks.items())
+    with open(path, 'a', encoding='utf-8') as profile_file:
+        profile_file.write(data)
+    return path
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_profile(request):
+            return self.get_response(request)
+        with SamplingProfiler() as profiler:
+            response = self.get_response(request)
+        write_stacks(get_view_name(request), profiler.stacks)
+        response[SAMPLES_HEADER] = str(profiler.samples)
+        return response
@@ -0,0 +1,157 @@
+"""Журнал медленных и повторяющихся запросов к базе.
+
+QueryInspectionMiddleware ставит обёртку execute_wrapper на все
+соединения и для каждого запроса запоминает, откуда он выполнен:
+строку шаблона, если запрос случился при отрисовке, и ближайшую строку
+кода проекта. В конце запроса в журнал core.perf.queries (в настройках
+это ротируемый файл QUERY_LOG_FILE) пишутся строки JSON:
+
+* slow — запрос дольше QUERY_SLOW_MS миллисекунд;
+* duplicate — один и тот же SQL выполнен QUERY_DUPLICATE_THRESHOLD
+  раз и больше за запрос, обычно это N+1 в цикле шаблона.
+
+Сводку по журналу выводит команда query_report.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+from .middleware import get_view_name
+
+logger = logging.getLogger(__name__)
+
+SLOW = 'slow'
+DUPLICATE = 'duplicate'
+DEFAULT_SLOW_MS = 100
+DEFAULT_DUPLICATE_THRESHOLD = 3
+# Код, в котором место запроса не ищем: Django, библиотеки и сам журнал.
+SKIPPED_PATHS = (
+    os.path.dirname(django.__file__),
+    os.path.dirname(os.path.abspath(__file__)),
+)
+SKIPPED_DIRECTORIES = ('site-packages', 'dist-packages')
+
+
+def get_slow_ms():
+    return getattr(settings, 'QUERY_SLOW_MS', DEFAULT_SLOW_MS)
+
+
+def get_duplicate_threshold():
+    return getattr(settings, 'QUERY_DUPLICATE_THRESHOLD',
+                   DEFAULT_DUPLICATE_THRESHOLD)
+
+
+def is_enabled():
+    enabled = getattr(settings, 'QUERY_INSPECTION_ENABLED', None)
+    if enabled is None:
+        return settings.DEBUG
+    return enabled
+
+
+def _is_project_file(filename):
+    return (filename.startswith(settings.BASE_DIR)
+            and not filename.startswith(SKIPPED_PATHS)
+            and not any(directory in filename.split(os.sep)
+                        for directory in SKIPPED_DIRECTORIES))
+
+
+def get_location(frame=None):
+    """Строка шаблона и строка кода проекта, откуда выполнен запрос."""
+    frame = frame or sys._getframe(1)
+    template = code = None
+    while frame is not None and template is None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            if isinstance(node, Node) and node.origin is not None:
+                name = node.origin.template_name or node.origin.name
+                template = f'{name}:{node.token.lineno}'
+        elif code is None and _is_project_file(frame.f_code.co_filename):
+            filename = os.path.relpath(frame.f_code.co_filename,
+                                       settings.BASE_DIR)
+            code = f'{filename}:{frame.f_lineno}'
+        frame = frame.f_back
+    return template, code
+
+
+class QueryInspector:
+    """Обёртка execute_wrapper, собирающая запросы одного HTTP-запроса."""
+
+    def __init__(self, slow_ms=None, duplicate_threshold=None):
+        self.slow_ms = get_slow_ms() if slow_ms is None else slow_ms
+        self.duplicate_threshold = (
+            get_duplicate_threshold() if duplicate_threshold is None
+            else duplicate_threshold)
+        self.locations = defaultdict(Counter)
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            template, code = get_location()
+            self.locations[sql][template, code] += 1
+            if duration_ms >= self.slow_ms:
+                self.slow_queries.append({
+                    'kind': SLOW,
+                    'template': template,
+                    'code': code,
+                    'duration_ms': round(duration_ms, 2),
+                    'sql': sql,
+                })
+
+    def duplicates(self):
+        """Повторы одного SQL по местам, откуда они выполнены."""
+        found = []
+        for sql, locations in self.locations.items():
+            total = sum(locations.values())
+            if total < self.duplicate_threshold:
+                continue
+            for (template, code), count in locations.most_common():
+                found.append({
+                    'kind': DUPLICATE,
+                    'template': template,
+                    'code': code,
+                    'count': count,
+                    'total': total,
+                    'sql': sql,
+                })
+        return found
+
+    def entries(self, view):
+        return [dict(entry, view=view)
+                for entry in self.slow_queries + self.duplicates()]
+
+
+@contextmanager
+def inspect_queries(**options):
+    """Собирает запросы ко всем базам внутри блока."""
+    inspector = QueryInspector(**options)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(inspector))
+        yield inspector
+
+
+class QueryInspectionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_enabled():
+            return self.get_response(request)
+        with inspect_queries() as inspector:
+            response = self.get_response(request)
+        for entry in inspector.entries(get_view_name(request)):
+            logger.warning(json.dumps(entry, ensure_ascii=False))
+        return response
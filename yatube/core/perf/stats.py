@@ -0,0 +1,178 @@
+"""Сводная статистика производительности по представлениям.
+
+Каждый процесс копит гистограмму времени ответа и суммы замеров по
+имени представления. Не чаще раза в PERFORMANCE_PUBLISH_SECONDS снимок
+процесса кладётся в общий кеш, откуда его собирают команда perf_stats
+и страница для персонала. Сброс общий для всех процессов: меняется
+эпоха, и каждый процесс обнуляет свои числа при следующей публикации.
+"""
+import copy
+import math
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Верхние границы корзин гистограммы, мс; последняя корзина — всё дольше.
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SUMS = ('wall_ms', 'queries', 'db_ms', 'cache_hits', 'cache_misses',
+        'template_ms', 'response_bytes')
+PROCESSES_KEY = 'perf:processes'
+EPOCH_KEY = 'perf:epoch'
+SNAPSHOT_KEY_PREFIX = 'perf:stats:'
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+DEFAULT_PUBLISH_SECONDS = 10
+
+
+def get_publish_seconds():
+    return getattr(settings, 'PERFORMANCE_PUBLISH_SECONDS',
+                   DEFAULT_PUBLISH_SECONDS)
+
+
+def get_process_key():
+    return f'{SNAPSHOT_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}'
+
+
+def empty_view_stats():
+    view_stats = dict.fromkeys(SUMS, 0)
+    view_stats['requests'] = 0
+    view_stats['buckets'] = [0] * (len(BUCKETS_MS) + 1)
+    return view_stats
+
+
+def merge(snapshots):
+    """Складывает снимки нескольких процессов."""
+    merged = {}
+    for snapshot in snapshots:
+        for view, view_stats in snapshot.items():
+            target = merged.setdefault(view, empty_view_stats())
+            for field in SUMS + ('requests',):
+                target[field] += view_stats[field]
+            target['buckets'] = [
+                total + count for total, count
+                in zip(target['buckets'], view_stats['buckets'])
+            ]
+    return merged
+
+
+def percentile_ms(view_stats, percent):
+    """Верхняя граница корзины с перцентилем, None — дольше всех корзин."""
+    rank = max(math.ceil(percent / 100 * view_stats['requests']), 1)
+    seen = 0
+    for bound, count in zip(BUCKETS_MS, view_stats['buckets']):
+        seen += count
+        if seen >= rank:
+            return bound
+    return None
+
+
+def summarize(snapshot):
+    """Строки отчёта по представлениям, самые затратные сверху."""
+    rows = []
+    for view, view_stats in snapshot.items():
+        requests = view_stats['requests']
+        if not requests:
+            continue
+        lookups = view_stats['cache_hits'] + view_stats['cache_misses']
+        rows.append({
+            'view': view,
+            'requests': requests,
+            'p50_ms': percentile_ms(view_stats, 50),
+            'p95_ms': percentile_ms(view_stats, 95),
+            'p99_ms': percentile_ms(view_stats, 99),
+            'avg_ms': round(view_stats['wall_ms'] / requests, 2),
+            'total_ms': round(view_stats['wall_ms'], 2),
+            'queries': round(view_stats['queries'] / requests, 2),
+            'db_ms': round(view_stats['db_ms'] / requests, 2),
+            'cache_hit_rate': (round(view_stats['cache_hits'] / lookups, 3)
+                               if lookups else None),
+            'template_ms': round(view_stats['template_ms'] / requests, 2),
+            'response_kib': round(
+                view_stats['response_bytes'] / requests / 1024, 1),
+        })
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
+
+
+class PerformanceStats:
+    """Статистика текущего процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._epoch = None
+        self._published = time.monotonic()
+
+    def record(self, view, metrics):
+        wall_ms = metrics.wall_seconds * 1000
+        values = {
+            'wall_ms': wall_ms,
+            'queries': metrics.queries,
+            'db_ms': metrics.db_seconds * 1000,
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+            'template_ms': metrics.template_seconds * 1000,
+            'response_bytes': metrics.response_bytes,
+        }
+        with self._lock:
+            view_stats = self._views.setdefault(view, empty_view_stats())
+            view_stats['requests'] += 1
+            for field, value in values.items():
+                view_stats[field] += value
+            view_stats['buckets'][bisect_left(BUCKETS_MS, wall_ms)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self._views)
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def publish_if_due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._published < get_publish_seconds():
+                return
+            self._published = now
+        self.publish()
+
+    def publish(self):
+        epoch = cache.get(EPOCH_KEY, 0)
+        if self._epoch is not None and epoch != self._epoch:
+            self.reset()
+        self._epoch = epoch
+        key = get_process_key()
+        cache.set(key, {'epoch': epoch, 'views': self.snapshot()},
+                  SNAPSHOT_TIMEOUT)
+        # Гонка двух процессов может потерять запись в списке,
+        # но процесс добавит себя снова при следующей публикации.
+        processes = cache.get(PROCESSES_KEY) or []
+        if key not in processes:
+            cache.set(PROCESSES_KEY, processes + [key], None)
+
+
+stats = PerformanceStats()
+
+
+def collect():
+    """Сводный снимок всех процессов, опубликованный в кеше."""
+    epoch = cache.get(EPOCH_KEY, 0)
+    keys = cache.get(PROCESSES_KEY) or []
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        cache.set(PROCESSES_KEY, [key for key in keys if key in found], None)
+    return merge(snapshot['views'] for snapshot in found.values()
+                 if snapshot['epoch'] == epoch)
+
+
+def reset_all():
+    """Обнуляет статистику всех процессов."""
+    cache.set(EPOCH_KEY, int(time.time() * 1000), None)
+    cache.delete_many(cache.get(PROCESSES_KEY) or [])
+    cache.delete(PROCESSES_KEY)
+    stats.reset()
@@ -0,0 +1,35 @@
+"""Шаблонный движок Django, который считает время отрисовки.
+
+Подключается в TEMPLATES вместо
+django.template.backends.django.DjangoTemplates. Время пишется в замеры
+текущего запроса; вложенная отрисовка (render_to_string внутри тега)
+в сумму второй раз не попадает.
+"""
+import time
+
+from django.template.backends import django as django_backend
+
+from .metrics import current_metrics
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        if metrics is None:
+            return super().render(context, request)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_seconds += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
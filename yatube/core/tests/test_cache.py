@@ -0,0 +1,132 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from core.cache.backends import LockedFileCache, TwoTierCache
+from core.cache.config import get_caches
+from core.cache.stampede import LOCK_PREFIX, get_or_compute
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.backends.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'COUNTERS': 'counters',
+            'LOCAL_MAX_ENTRIES': 2,
+            'LOCAL_BYPASS': ('counter:',),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-tests',
+    },
+    'counters': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-counters',
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = TwoTierCache('', CACHES['default'])
+        self.shared = caches['shared']
+        self.counters = caches['counters']
+        self.cache.clear()
+
+    def test_reads_are_served_locally(self):
+        self.cache.set('key', {'value': 1})
+        self.shared.delete('key')
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+
+    def test_local_copies_are_independent(self):
+        self.cache.set('key', {'value': 1})
+        self.cache.get('key')['value'] = 2
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+
+    def test_local_tier_is_bounded(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.shared.clear()
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'c': 3})
+
+    def test_bypassed_keys_are_always_read_from_counters(self):
+        self.cache.set('counter:feed', 1)
+        self.counters.incr('counter:feed')
+        self.assertEqual(self.cache.get('counter:feed'), 2)
+        self.assertIsNone(self.shared.get('counter:feed'))
+
+    def test_get_many_reads_both_backends(self):
+        self.cache.set_many({'key': 1, 'counter:feed': 2})
+        self.assertEqual(self.counters.get('counter:feed'), 2)
+        self.assertEqual(self.cache.get_many(['key', 'counter:feed']),
+                         {'key': 1, 'counter:feed': 2})
+
+
+class LockedFileCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.cache = LockedFileCache(directory, {
+            'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 1}})
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.cache.add('generation', 1, None))
+        self.assertFalse(self.cache.add('generation', 5, None))
+        self.assertEqual(self.cache.incr('generation'), 2)
+        self.assertEqual(self.cache.decr('generation'), 1)
+
+    def test_entries_are_not_culled(self):
+        for number in range(5):
+            self.cache.set(f'generation:{number}', number, None)
+        self.assertEqual(self.cache.get('generation:0'), 0)
+
+
+class CacheConfigTests(SimpleTestCase):
+    def test_default_is_process_local(self):
+        config = get_caches({})
+        self.assertEqual(config['shared']['BACKEND'],
+                         'django.core.cache.backends.locmem.LocMemCache')
+        self.assertNotEqual(config['counters']['LOCATION'],
+                            config['shared']['LOCATION'])
+
+    def test_file_cache_needs_location(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_caches({'CACHE_BACKEND': 'file'})
+        config = get_caches({'CACHE_BACKEND': 'file',
+                             'CACHE_LOCATION': '/srv/cache'})
+        self.assertEqual(config['counters']['BACKEND'],
+                         'core.cache.backends.LockedFileCache')
+
+
+@override_settings(CACHES=CACHES)
+class StampedeTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['shared']
+        self.cache.clear()
+
+    def test_value_is_computed_once(self):
+        compute = mock.Mock(return_value='page')
+        self.assertEqual(get_or_compute(self.cache, 'k', compute, 60), 'page')
+        self.assertEqual(get_or_compute(self.cache, 'k', compute, 60), 'page')
+        compute.assert_called_once_with()
+        self.assertIsNone(self.cache.get(LOCK_PREFIX + 'k'))
+
+    def test_waiter_gets_value_of_lock_holder(self):
+        self.cache.add(LOCK_PREFIX + 'k', 1)
+        compute = mock.Mock(return_value='own page')
+
+        def sleep(seconds):
+            self.cache.set('k', 'page')
+
+        with mock.patch('core.cache.stampede.time.sleep', sleep):
+            value = get_or_compute(self.cache, 'k', compute, 60)
+        self.assertEqual(value, 'page')
+        compute.assert_not_called()
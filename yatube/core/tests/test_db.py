@@ -0,0 +1,213 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock, skipUnless
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core.db.backends.mixins import HealthCheckMixin
+from core.db.backends.sqlite3.base import DatabaseWrapper
+from core.db.config import get_database
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_sqlite_by_default(self):
+        database = get_database({}, '/srv/yatube')
+        self.assertEqual(database['ENGINE'], 'core.db.backends.sqlite3')
+        self.assertEqual(database['NAME'], '/srv/yatube/db.sqlite3')
+        self.assertEqual(database['PRAGMAS']['journal_mode'], 'WAL')
+
+    def test_postgresql(self):
+        database = get_database({
+            'DB_ENGINE': 'postgresql',
+            'DB_NAME': 'yatube',
+            'DB_HOST': 'db',
+            'DB_CONN_MAX_AGE': '300',
+        })
+        self.assertEqual(database['ENGINE'], 'core.db.backends.postgresql')
+        self.assertEqual(database['HOST'], 'db')
+        self.assertEqual(database['CONN_MAX_AGE'], 300)
+        self.assertTrue(database['HEALTH_CHECKS'])
+
+    def test_postgresql_pool(self):
+        database = get_database({'DB_ENGINE': 'postgresql',
+                                 'DB_POOL_SIZE': '8'})
+        self.assertEqual(database['ENGINE'],
+                         'core.db.backends.postgresql_pool')
+        self.assertEqual(database['POOL_SIZE'], 8)
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_database({'DB_ENGINE': 'oracle'})
+
+
+class SQLiteBackendTests(TestCase):
+    def test_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class SQLiteFileBackendTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'db.sqlite3')
+        self.wrapper = DatabaseWrapper(
+            dict(connection.settings_dict, NAME=self.path), alias='file')
+        self.addCleanup(self.wrapper.close)
+
+    def test_journal_mode_is_wal(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_transaction_takes_write_lock_at_start(self):
+        self.wrapper.ensure_connection()
+        self.wrapper._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaises(sqlite3.OperationalError):
+            other.execute('BEGIN IMMEDIATE')
+
+
+class HealthCheckedWrapper(HealthCheckMixin, DatabaseWrapper):
+    pass
+
+
+class HealthCheckMixinTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.wrapper = HealthCheckedWrapper(dict(
+            connection.settings_dict, HEALTH_CHECKS=True,
+            NAME=os.path.join(directory, 'db.sqlite3'),
+        ), alias='checked')
+        self.addCleanup(self.wrapper.close)
+        self.wrapper.ensure_connection()
+
+    def test_broken_connection_is_reopened(self):
+        old = self.wrapper.connection
+        self.wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(self.wrapper, 'is_usable',
+                               return_value=False):
+            self.wrapper.ensure_connection()
+        self.assertIsNot(self.wrapper.connection, old)
+
+    def test_checked_once_per_request(self):
+        self.wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(self.wrapper, 'is_usable',
+                               return_value=True) as is_usable:
+            self.wrapper.ensure_connection()
+            self.wrapper.ensure_connection()
+        is_usable.assert_called_once_with()
+
+    def test_not_checked_without_setting(self):
+        self.wrapper.settings_dict['HEALTH_CHECKS'] = False
+        self.wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(self.wrapper, 'is_usable') as is_usable:
+            self.wrapper.ensure_connection()
+        is_usable.assert_not_called()
+
+
+class FakeConnection:
+    """Соединение psycopg2 без сервера."""
+
+    def __init__(self, broken=False):
+        self.closed = 0
+        self.broken = broken
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.rolled_back = False
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rolled_back = True
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def cursor(self):
+        if self.broken:
+            raise psycopg2.OperationalError('server closed the connection')
+        return mock.MagicMock()
+
+
+@skipUnless(psycopg2, 'нужен psycopg2')
+class PostgreSQLPoolTests(SimpleTestCase):
+    def setUp(self):
+        from core.db.backends.postgresql_pool import base
+        self.addCleanup(base._pools.clear)
+        base._pools.clear()
+        self.connect = mock.patch.object(
+            base.base.DatabaseWrapper, 'get_new_connection',
+            side_effect=lambda params: FakeConnection(),
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+        self.wrapper = base.DatabaseWrapper({
+            **get_database({'DB_ENGINE': 'postgresql',
+                            'DB_POOL_SIZE': '1'}),
+            'TIME_ZONE': None,
+        }, alias='pooled')
+
+    def checkout(self):
+        self.wrapper.connection = self.wrapper.get_new_connection({})
+        return self.wrapper.connection
+
+    def release(self):
+        self.wrapper._close()
+        self.wrapper.connection = None
+
+    def test_connection_is_returned_and_reused(self):
+        first = self.checkout()
+        self.release()
+        self.assertEqual(self.wrapper.pool.qsize(), 1)
+        self.assertIs(self.checkout(), first)
+        self.assertEqual(self.connect.call_count, 1)
+        self.assertFalse(first.closed)
+
+    def test_unfinished_transaction_is_rolled_back(self):
+        first = self.checkout()
+        first.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        self.release()
+        self.assertTrue(first.rolled_back)
+        self.assertIs(self.checkout(), first)
+
+    def test_broken_connection_is_dropped(self):
+        first = self.checkout()
+        self.release()
+        first.broken = True
+        second = self.checkout()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(self.wrapper.pool.qsize(), 0)
+
+    def test_closed_connection_is_not_returned(self):
+        first = self.checkout()
+        first.close()
+        self.release()
+        self.assertEqual(self.wrapper.pool.qsize(), 0)
+
+    def test_exhausted_pool_opens_and_closes_extra_connections(self):
+        first = self.checkout()
+        second = self.wrapper.get_new_connection({})
+        self.assertIsNot(second, first)
+        self.release()
+        self.wrapper.connection = second
+        self.release()
+        self.assertEqual(self.wrapper.pool.qsize(), 1)
+        self.assertFalse(first.closed)
+        self.assertTrue(second.closed)
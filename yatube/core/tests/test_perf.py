@@ -0,0 +1,107 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.perf import stats as perf_stats
+from core.perf.metrics import RequestMetrics
+from core.perf.stats import PerformanceStats, merge, percentile_ms
+from posts.models import Post
+
+User = get_user_model()
+
+
+def make_metrics(wall_ms, queries=1):
+    metrics = RequestMetrics()
+    metrics.wall_seconds = wall_ms / 1000
+    metrics.queries = queries
+    return metrics
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=1)
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        perf_stats.stats.reset()
+        user = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=user, text='Текст')
+
+    def test_server_timing_header(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(timing, r'tpl;dur=(?!0\.0$)')
+        self.assertRegex(timing, r'cache;desc="[1-9]\d* hits, \d+ misses"')
+
+    def test_records_stats_by_view(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        view_stats = perf_stats.stats.snapshot()['posts:index']
+        self.assertEqual(view_stats['requests'], 2)
+        self.assertGreater(view_stats['response_bytes'], 0)
+        self.assertGreater(view_stats['cache_hits'], 0)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_no_measurements_when_sampling_is_off(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(perf_stats.stats.snapshot(), {})
+
+    def test_endpoint_is_for_staff(self):
+        url = reverse('core:performance_stats')
+        staff = User.objects.create_user(username='Staff', is_staff=True)
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        views = [row['view'] for row in response.json()['views']]
+        self.assertIn('posts:index', views)
+
+    def test_command_prints_and_resets(self):
+        self.client.get(reverse('posts:index'))
+        perf_stats.stats.publish()
+        out = StringIO()
+        call_command('perf_stats', '--reset', stdout=out)
+        self.assertIn('posts:index', out.getvalue())
+        self.assertEqual(perf_stats.collect(), {})
+
+
+class PerformanceStatsTests(SimpleTestCase):
+    def test_percentiles_are_bucket_bounds(self):
+        stats = PerformanceStats()
+        for wall_ms in (3, 4, 30, 30000):
+            stats.record('view', make_metrics(wall_ms))
+        view_stats = stats.snapshot()['view']
+        self.assertEqual(percentile_ms(view_stats, 50), 5)
+        self.assertEqual(percentile_ms(view_stats, 75), 50)
+        self.assertIsNone(percentile_ms(view_stats, 99))
+
+    def test_merge_adds_processes(self):
+        first, second = PerformanceStats(), PerformanceStats()
+        first.record('view', make_metrics(3, queries=2))
+        second.record('view', make_metrics(300, queries=4))
+        merged = merge([first.snapshot(), second.snapshot()])['view']
+        self.assertEqual(merged['requests'], 2)
+        self.assertEqual(merged['queries'], 6)
+        self.assertEqual(sum(merged['buckets']), 2)
+
+    def test_collect_merges_published_processes(self):
+        cache.clear()
+        for number in range(2):
+            stats = PerformanceStats()
+            stats.record('view', make_metrics(10))
+            with mock.patch.object(perf_stats, 'get_process_key',
+                                   return_value=f'perf:stats:test:{number}'):
+                stats.publish()
+        self.assertEqual(perf_stats.collect()['view']['requests'], 2)
+
+        perf_stats.reset_all()
+        self.assertEqual(perf_stats.collect(), {})
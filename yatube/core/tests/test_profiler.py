@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.perf.profiler import (SAMPLES_HEADER, SamplingProfiler,
+                                make_token)
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class SamplingProfilerTests(SimpleTestCase):
+    def test_collects_stacks_of_current_thread(self):
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy_loop(0.05)
+        self.assertGreater(profiler.samples, 0)
+        stack, _ = profiler.stacks.most_common(1)[0]
+        frames = stack.split(';')
+        self.assertTrue(frames[0].startswith(
+            'test_collects_stacks_of_current_thread ('))
+        self.assertTrue(frames[-1].startswith('busy_loop (core/tests/'))
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_override = override_settings(PROFILING_DIR=self.directory,
+                                              PROFILING_INTERVAL=0.0005)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.profile_path = os.path.join(self.directory, 'posts.index.folded')
+
+    def test_signed_header_turns_profiling_on(self):
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_X_YATUBE_PROFILE=make_token())
+        self.assertIn(SAMPLES_HEADER, response)
+        if int(response[SAMPLES_HEADER]):
+            with open(self.profile_path, encoding='utf-8') as profile_file:
+                for line in profile_file:
+                    stack, count = line.rsplit(' ', 1)
+                    self.assertTrue(stack.startswith('__call__ ('))
+                    self.assertGreater(int(count), 0)
+
+    def test_bad_or_missing_header_is_ignored(self):
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_X_YATUBE_PROFILE='forged')
+        self.assertNotIn(SAMPLES_HEADER, response)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(SAMPLES_HEADER, response)
+        self.assertFalse(os.path.exists(self.profile_path))
+
+    @override_settings(PROFILING_ONE_IN=1)
+    def test_sampling_without_header(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn(SAMPLES_HEADER, response)
+
+    def test_token_command(self):
+        out = StringIO()
+        call_command('profile_token', stdout=out)
+        header, token = out.getvalue().strip().split(': ')
+        self.assertEqual(header, 'X-Yatube-Profile')
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_X_YATUBE_PROFILE=token)
+        self.assertIn(SAMPLES_HEADER, response)
@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.perf.queries import DUPLICATE, SLOW, inspect_queries, is_enabled
+from posts.models import Post
+
+User = get_user_model()
+
+POSTS_TEMPLATE = '''{% for post in posts %}
+{{ post.author.username }}
+{% endfor %}'''
+
+
+class QueryInspectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            author = User.objects.create_user(username=f'Author{i}')
+            Post.objects.create(author=author, text=str(i))
+
+    def test_finds_repeated_query_in_template_loop(self):
+        posts = list(Post.objects.all())
+        with inspect_queries(duplicate_threshold=3) as inspector:
+            Template(POSTS_TEMPLATE).render(Context({'posts': posts}))
+        duplicates = inspector.duplicates()
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0]['kind'], DUPLICATE)
+        self.assertEqual(duplicates[0]['count'], 3)
+        self.assertTrue(duplicates[0]['template'].endswith(':2'))
+
+    def test_no_duplicates_with_select_related(self):
+        with inspect_queries(duplicate_threshold=2) as inspector:
+            posts = list(Post.objects.select_related('author'))
+            Template(POSTS_TEMPLATE).render(Context({'posts': posts}))
+        self.assertEqual(inspector.duplicates(), [])
+
+    def test_slow_queries_point_to_code(self):
+        with inspect_queries(slow_ms=0) as inspector:
+            Post.objects.count()
+        entry, = inspector.slow_queries
+        self.assertEqual(entry['kind'], SLOW)
+        self.assertIsNone(entry['template'])
+        self.assertTrue(entry['code'].startswith(
+            os.path.join('core', 'tests', 'test_queries.py')))
+
+    def test_enabled_follows_debug_by_default(self):
+        for debug in (True, False):
+            with self.subTest(debug=debug), override_settings(
+                    QUERY_INSPECTION_ENABLED=None, DEBUG=debug):
+                self.assertIs(is_enabled(), debug)
+        with override_settings(QUERY_INSPECTION_ENABLED=False, DEBUG=True):
+            self.assertIs(is_enabled(), False)
+
+    @override_settings(QUERY_INSPECTION_ENABLED=True, QUERY_SLOW_MS=0)
+    def test_middleware_logs_entries_with_view(self):
+        cache.clear()
+        with self.assertLogs('core.perf.queries', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        entries = [json.loads(record.getMessage())
+                   for record in logs.records]
+        self.assertTrue(entries)
+        self.assertEqual({entry['view'] for entry in entries},
+                         {'posts:index'})
+
+
+class QueryReportCommandTests(TestCase):
+    def setUp(self):
+        log = tempfile.NamedTemporaryFile('w', suffix='.log', delete=False)
+        self.addCleanup(os.remove, log.name)
+        self.log_path = log.name
+        entry = {'kind': DUPLICATE, 'view': 'posts:index',
+                 'template': 'includes/post_data.html:7', 'code': None,
+                 'count': 10, 'total': 10, 'sql': 'SELECT 1'}
+        with log:
+            for count in (10, 12):
+                log.write(json.dumps(dict(entry, count=count)) + '\n')
+            log.write('не JSON\n')
+
+    def test_groups_entries(self):
+        out = StringIO()
+        call_command('query_report', '--log', self.log_path, stdout=out)
+        rows = out.getvalue().splitlines()[1:]
+        self.assertEqual(len(rows), 1)
+        self.assertIn('includes/post_data.html:7\t-\t2\t12\t10', rows[0])
+
+    def test_check_fails_on_findings(self):
+        with self.assertRaises(CommandError):
+            call_command('query_report', '--log', self.log_path, '--check',
+                         stdout=StringIO())
+        out = StringIO()
+        call_command('query_report', '--log', self.log_path, '--check',
+                     '--kind', SLOW, stdout=out)
@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.db.replicas import STICKY_COOKIE, read_from_replica
+from posts.cache import FEED, cache_feed
+from posts.decorators import conditional_page
+from posts.models import Post
+
+User = get_user_model()
+
+
+@read_from_replica
+def read_database_view(request):
+    return HttpResponse(router.db_for_read(Post))
+
+
+@read_from_replica
+@conditional_page(FEED)
+@cache_feed(FEED)
+def cached_feed_view(request):
+    cached_feed_view.calls += 1
+    return HttpResponse(router.db_for_read(Post))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def test_reads_go_to_replica_inside_decorated_view(self):
+        response = read_database_view(self.factory.get('/'))
+        self.assertEqual(response.content, b'replica')
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_unsafe_methods_read_primary(self):
+        response = read_database_view(self.factory.post('/'))
+        self.assertEqual(response.content, b'default')
+
+    def test_writer_reads_primary_after_write(self):
+        user = User.objects.create_user(username='Writer')
+        post = Post.objects.create(author=user, text='Текст')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:add_comment', args=(post.pk,)),
+            {'text': 'Комментарий'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        self.assertEqual(read_database_view(request).content, b'default')
+
+    def test_replica_pages_are_cached_for_lag_window(self):
+        cached_feed_view.calls = 0
+        with mock.patch('core.db.replicas.time.time', return_value=100):
+            first = cached_feed_view(self.factory.get('/'))
+            second = cached_feed_view(self.factory.get('/'))
+        self.assertEqual(first.content, b'replica')
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(cached_feed_view.calls, 1)
+
+        with mock.patch('core.db.replicas.time.time', return_value=200):
+            response = cached_feed_view(
+                self.factory.get('/', HTTP_IF_NONE_MATCH=first['ETag']))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_primary_pages_are_cached(self):
+        cached_feed_view.calls = 0
+        for _ in range(2):
+            response = cached_feed_view(self.factory.get('/'))
+            self.assertIn('ETag', response)
+        self.assertEqual(cached_feed_view.calls, 1)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        response = read_database_view(self.factory.get('/'))
+        self.assertEqual(response.content, b'default')
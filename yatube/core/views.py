@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .perf.stats import collect, stats, summarize
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -7,3 +11,10 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403.html')
+
+
+@staff_member_required
+def performance_stats(request):
+    """Сводка замеров производительности по представлениям."""
+    stats.publish()
+    return JsonResponse({'views': summarize(collect())})
@@ -0,0 +1,85 @@
+"""JSON-представления лент и поиска для мобильных клиентов.
+
+Посты сериализуются вручную только нужными полями, ленты листаются
+курсором. ETag строится по поколениям кеша, поэтому повторный запрос
+клиента с If-None-Match получает 304 без обращения к базе.
+"""
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import condition
+
+from .cache import FEED, generations_etag
+from .counters import get_profile
+from .models import Group, Post, User
+from .paginator import CursorPaginator
+from .search import get_search_params, search_posts
+
+API_POSTS_ON_PAGE = 20
+SEARCH_RESULTS_LIMIT = 20
+
+
+def serialize_post(post, request):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'image': request.build_absolute_uri(post.image.url)
+        if post.image else None,
+        'url': request.build_absolute_uri(
+            reverse('posts:post_detail', args=(post.pk,))),
+    }
+
+
+def serialize_page(queryset, request, **paginator_options):
+    paginator = CursorPaginator(queryset, API_POSTS_ON_PAGE,
+                                count_limit=0, **paginator_options)
+    page = paginator.get_page(request.GET.get('page'),
+                              cursor=request.GET.get('cursor'))
+    return {
+        'results': [serialize_post(post, request) for post in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+@condition(etag_func=generations_etag(FEED))
+def index(request):
+    return JsonResponse(serialize_page(Post.objects.for_feed(), request))
+
+
+@condition(etag_func=generations_etag(FEED))
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    data = {'group': {
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+    }}
+    data.update(serialize_page(group.post_set.for_feed(), request))
+    return JsonResponse(data)
+
+
+@condition(etag_func=generations_etag(FEED))
+def profile(request, username):
+    author = get_object_or_404(User.objects.select_related('profile'),
+                               username=username)
+    data = {'author': {
+        'username': author.username,
+        'posts_count': get_profile(author).posts_count,
+    }}
+    data.update(serialize_page(
+        Post.objects.for_feed().filter(author=author), request))
+    return JsonResponse(data)
+
+
+def search(request):
+    """Результаты поиска по релевантности с курсором next_cursor."""
+    posts, next_cursor = search_posts(**get_search_params(request.GET),
+                                      limit=SEARCH_RESULTS_LIMIT)
+    return JsonResponse({
+        'results': [serialize_post(post, request) for post in posts],
+        'next_cursor': next_cursor,
+    })
@@ -0,0 +1,330 @@
+"""Замеры времени ответа представлений posts.
+
+Сценарии гоняются тестовым клиентом в одном или нескольких потоках
+либо настоящими HTTP-запросами к локальному WSGI-серверу. По каждому
+сценарию считаются перцентили времени ответа, запросы к базе и пик
+выделенной памяти на запрос; результат можно сравнить с базовым
+файлом, чтобы заметить регресс.
+"""
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from http.client import HTTPConnection
+
+from django.conf import settings
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler)
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.cache.config import get_caches
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__),
+                             'benchmark_baseline.json')
+OK_STATUSES = (200, 302)
+FEED_PAGES = 5
+POPULAR_AUTHORS = 20
+
+Scenario = namedtuple('Scenario', 'name method login build')
+Sample = namedtuple('Sample', 'seconds queries')
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def _index(dataset, rng):
+    return f'{reverse("posts:index")}?page={rng.randint(1, FEED_PAGES)}', None
+
+
+def _group_posts(dataset, rng):
+    group = rng.choice(dataset.groups)
+    return reverse('posts:group_list', args=(group.slug,)), None
+
+
+def _profile(dataset, rng):
+    author = rng.choice(dataset.users[:POPULAR_AUTHORS])
+    return reverse('posts:profile', args=(author.username,)), None
+
+
+def _post_detail(dataset, rng):
+    post = rng.choice(dataset.posts)
+    return reverse('posts:post_detail', args=(post.pk,)), None
+
+
+def _follow_index(dataset, rng):
+    return reverse('posts:follow_index'), None
+
+
+def _post_create(dataset, rng):
+    return reverse('posts:post_create'), {'text': 'Замер создания поста'}
+
+
+def _add_comment(dataset, rng):
+    post = rng.choice(dataset.posts)
+    return (reverse('posts:add_comment', args=(post.pk,)),
+            {'text': 'Замер комментария'})
+
+
+SCENARIOS = (
+    Scenario('index', 'get', False, _index),
+    Scenario('group_posts', 'get', False, _group_posts),
+    Scenario('profile', 'get', False, _profile),
+    Scenario('post_detail', 'get', False, _post_detail),
+    Scenario('follow_index', 'get', True, _follow_index),
+    Scenario('post_create', 'post', True, _post_create),
+    Scenario('add_comment', 'post', True, _add_comment),
+)
+SCENARIO_NAMES = tuple(scenario.name for scenario in SCENARIOS)
+
+
+def get_scenarios(names=None):
+    if not names:
+        return SCENARIOS
+    return tuple(scenario for scenario in SCENARIOS
+                 if scenario.name in names)
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class QueryCounter:
+    """Считает запросы соединения, не завися от DEBUG и журнала запросов."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _make_client(scenario, dataset):
+    client = Client()
+    if scenario.login:
+        client.force_login(dataset.reader)
+    return client
+
+
+def _request(client, scenario, dataset, rng):
+    path, data = scenario.build(dataset, rng)
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        response = getattr(client, scenario.method)(path, data or {})
+        elapsed = time.perf_counter() - started
+    if response.status_code not in OK_STATUSES:
+        raise BenchmarkError(
+            f'{scenario.name}: {path} ответил {response.status_code}')
+    return Sample(elapsed, counter.count)
+
+
+def _client_worker(count, seed, scenario, dataset):
+    rng = random.Random(seed)
+    client = _make_client(scenario, dataset)
+    try:
+        return [_request(client, scenario, dataset, rng)
+                for _ in range(count)]
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def local_server():
+    """Многопоточный WSGI-сервер проекта на свободном порту."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietRequestHandler)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _server_worker(count, seed, scenario, dataset, port):
+    rng = random.Random(seed)
+    headers = {}
+    if scenario.login:
+        client = _make_client(scenario, dataset)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        headers['Cookie'] = f'{settings.SESSION_COOKIE_NAME}={session}'
+    http = HTTPConnection('127.0.0.1', port)
+    samples = []
+    try:
+        for _ in range(count):
+            path, _ = scenario.build(dataset, rng)
+            started = time.perf_counter()
+            http.request('GET', path, headers=headers)
+            response = http.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - started
+            if response.status not in OK_STATUSES:
+                raise BenchmarkError(
+                    f'{scenario.name}: {path} ответил {response.status}')
+            samples.append(Sample(elapsed, None))
+    finally:
+        http.close()
+        connection.close()
+    return samples
+
+
+def _run_workers(worker, requests, concurrency, seed):
+    if concurrency == 1:
+        return worker(requests, seed)
+    counts = [requests // concurrency + (index < requests % concurrency)
+              for index in range(concurrency)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker, count, seed + index)
+                   for index, count in enumerate(counts)]
+        return [sample for future in futures for sample in future.result()]
+
+
+def measure_allocations(scenario, dataset, requests, seed=0):
+    """Медиана пика памяти на запрос, КиБ, по tracemalloc."""
+    if not requests:
+        return None
+    rng = random.Random(seed)
+    client = _make_client(scenario, dataset)
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(requests):
+            tracemalloc.clear_traces()
+            _request(client, scenario, dataset, rng)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return round(sorted(peaks)[len(peaks) // 2] / 1024, 1)
+
+
+def summarize(name, samples, wall_seconds, alloc_kib=None):
+    milliseconds = sorted(sample.seconds * 1000 for sample in samples)
+    queries = [sample.queries for sample in samples
+               if sample.queries is not None]
+    return {
+        'scenario': name,
+        'requests': len(samples),
+        'p50_ms': round(percentile(milliseconds, 50), 2),
+        'p95_ms': round(percentile(milliseconds, 95), 2),
+        'p99_ms': round(percentile(milliseconds, 99), 2),
+        'rps': round(len(samples) / wall_seconds, 1),
+        'queries': max(queries) if queries else None,
+        'alloc_kib': alloc_kib,
+    }
+
+
+def run_scenario(scenario, dataset, requests=50, concurrency=1, warmup=5,
+                 memory_requests=5, port=None, seed=0):
+    """Прогоняет сценарий и возвращает сводку замеров.
+
+    Если задан port, запросы идут по HTTP к локальному серверу;
+    так можно гонять только GET-сценарии.
+    """
+    if port is None:
+        worker = partial(_client_worker, scenario=scenario, dataset=dataset)
+    elif scenario.method != 'get':
+        raise BenchmarkError(f'{scenario.name}: по HTTP только GET')
+    else:
+        worker = partial(_server_worker, scenario=scenario, dataset=dataset,
+                         port=port)
+    _run_workers(worker, warmup, 1, seed)
+    started = time.perf_counter()
+    samples = _run_workers(worker, requests, concurrency, seed + 1)
+    wall_seconds = time.perf_counter() - started
+    alloc_kib = None
+    if port is None:
+        alloc_kib = measure_allocations(scenario, dataset, memory_requests,
+                                        seed)
+    return summarize(scenario.name, samples, wall_seconds, alloc_kib)
+
+
+@contextmanager
+def benchmark_environment():
+    """Отдельная база, временный MEDIA_ROOT и пустой кеш для замеров.
+
+    Кеш — свой locmem с теми же уровнями, что и в CACHES, поэтому
+    общий кеш работающего сайта не затрагивается. Миниатюры создаются
+    сразу, чтобы фоновые потоки не искажали замеры, а реплики
+    не используются.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-benchmark-')
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if connection.vendor == 'sqlite' and not old_test_name:
+        # Потокам нужна общая база на диске, а не в памяти.
+        test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    try:
+        caches = get_caches(dict(os.environ, CACHE_BACKEND='locmem',
+                                 CACHE_LOCATION=directory))
+        with override_settings(MEDIA_ROOT=os.path.join(directory, 'media'),
+                               CACHES=caches,
+                               DEBUG=False,
+                               POSTS_THUMBNAIL_WORKERS=0,
+                               DATABASE_REPLICAS=[]):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    baseline = {result['scenario']: result for result in results}
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(baseline, baseline_file, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+        baseline_file.write('\n')
+
+
+def compare_with_baseline(results, baseline, tolerance=0.25):
+    """Сообщения о сценариях, ставших медленнее или тяжелее базы."""
+    regressions = []
+    for result in results:
+        expected = baseline.get(result['scenario'])
+        if expected is None:
+            continue
+        name = result['scenario']
+        limit = expected['p95_ms'] * (1 + tolerance)
+        if result['p95_ms'] > limit:
+            regressions.append(
+                f'{name}: p95 {result["p95_ms"]} мс, '
+                f'в базе {expected["p95_ms"]} мс')
+        if (result['queries'] is not None
+                and expected.get('queries') is not None
+                and result['queries'] > expected['queries']):
+            regressions.append(
+                f'{name}: {result["queries"]} запросов, '
+                f'в базе {expected["queries"]}')
+    return regressions
@@ -0,0 +1,148 @@
+"""Кеш лент с версиями вместо фиксированного времени жизни.
+
+Каждой группе данных соответствует счётчик поколения. Ключи кеша
+включают текущие поколения, поэтому после изменения данных старые
+записи просто перестают читаться, а новые ответы видны сразу.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache.stampede import get_or_compute
+from core.db.replicas import (get_sticky_seconds, reading_from_replica,
+                              replica_lag_window)
+
+FEED = 'feed'
+GROUPS = 'groups'
+FEED_CACHE_TIMEOUT = 6 * 60 * 60
+POST_FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+
+def post_generation(post_id):
+    return f'post:{post_id}'
+
+
+def post_fragment_key(post, view_name, groups_generation):
+    """Ключ HTML поста: меняется при правке поста и любой группы."""
+    return ':'.join((
+        'posts:fragment',
+        str(post.pk),
+        str(post.updated_at.timestamp()),
+        view_name,
+        str(groups_generation),
+    ))
+
+
+def _generation_key(name):
+    return f'posts:generation:{name}'
+
+
+def _initial_generation():
+    # Начинаем не с нуля, чтобы после потери счётчика не прочитать
+    # записи, оставшиеся от прошлых поколений с теми же номерами.
+    return int(time.time() * 1000)
+
+
+def get_generations(*names):
+    keys = {_generation_key(name): name for name in names}
+    found = cache.get_many(keys)
+    missing = {key: _initial_generation()
+               for key in keys if key not in found}
+    for key, generation in missing.items():
+        cache.add(key, generation, None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return tuple(found.get(key, missing.get(key)) for key in keys)
+
+
+def get_generation(name):
+    return get_generations(name)[0]
+
+
+def bump_generation(*names):
+    """Делает недействительным всё, что закешировано с этими именами."""
+    for name in names:
+        key = _generation_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_generation(), None)
+
+
+def get_user_cache_key(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user{user.pk}'
+    return 'anonymous'
+
+
+def profile_generation(username):
+    return f'profile:{username}'
+
+
+def generations_etag(*generation_names, per_user=False,
+                     extra_generations=None):
+    """Функция ETag для condition: поколения данных плюс адрес запроса.
+
+    Пока данные не менялись, ETag тот же, и клиент получает 304
+    без выполнения представления. extra_generations(request, *args,
+    **kwargs) добавляет поколения, зависящие от аргументов
+    представления; per_user делает ETag своим для каждого пользователя
+    и его CSRF-токена, чтобы после смены токена форма на странице
+    не осталась со старым.
+    При чтении с реплики ETag меняется с окном её отставания.
+    """
+    def etag_func(request, *args, **kwargs):
+        names = list(generation_names)
+        if extra_generations is not None:
+            names.extend(extra_generations(request, *args, **kwargs))
+        parts = ['-'.join(map(str, get_generations(*names)))]
+        if reading_from_replica():
+            parts.append(f'replica{replica_lag_window()}')
+        if per_user:
+            parts.append(get_user_cache_key(request))
+            parts.append(request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+        parts.append(request.get_full_path())
+        return hashlib.md5(':'.join(parts).encode()).hexdigest()
+    return etag_func
+
+
+def cache_feed(*generation_names, timeout=FEED_CACHE_TIMEOUT,
+               per_user=True):
+    """Кеширует ответ представления до смены поколения данных.
+
+    Ответ отличается для анонимов и для каждого вошедшего
+    пользователя, поскольку шапка страницы зависит от входа;
+    per_user=False хранит один ответ для всех.
+    После смены поколения страницу рендерит один запрос, остальные
+    ждут его результата. Ответы, прочитанные с реплики, хранятся
+    не дольше допустимого отставания реплики.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            generations = get_generations(*generation_names)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = ':'.join((
+                'posts:view',
+                view.__name__,
+                '-'.join(map(str, generations)),
+                get_user_cache_key(request) if per_user else 'all',
+                path,
+            ))
+            view_timeout = timeout
+            if reading_from_replica():
+                view_timeout = min(timeout, get_sticky_seconds())
+            return get_or_compute(
+                cache, key,
+                lambda: view(request, *args, **kwargs),
+                view_timeout,
+                should_cache=lambda response: response.status_code == 200,
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,69 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, Profile, User
+
+# Поле профиля -> (модель, поле со ссылкой на пользователя).
+PROFILE_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _count_subquery(model, field, outer_field):
+    counts = (model.objects
+              .filter(**{field: OuterRef(outer_field)})
+              .order_by()
+              .values(field)
+              .annotate(total=Count('pk'))
+              .values('total'))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount_profiles(users=None):
+    """Пересчитывает счётчики профилей, создавая недостающие профили."""
+    if users is None:
+        users = User.objects.all()
+    missing = users.filter(profile__isnull=True).values_list('pk', flat=True)
+    Profile.objects.bulk_create(
+        [Profile(user_id=user_id) for user_id in missing])
+    return Profile.objects.filter(user__in=users).update(**{
+        counter: _count_subquery(model, field, 'user_id')
+        for counter, (model, field) in PROFILE_COUNTERS.items()
+    })
+
+
+def recount_comments(posts=None):
+    if posts is None:
+        posts = Post.objects.all()
+    return posts.update(
+        comments_count=_count_subquery(Comment, 'post', 'pk'))
+
+
+def change_profile_counters(user_id, **deltas):
+    """Атомарно сдвигает счётчики профиля на заданные величины.
+
+    Если профиля ещё нет, при увеличении он создаётся с точными
+    значениями, а при уменьшении ничего не делается: значит,
+    пользователь удаляется вместе с профилем.
+    """
+    updated = Profile.objects.filter(user_id=user_id).update(**{
+        counter: Greatest(F(counter) + delta, 0)
+        for counter, delta in deltas.items()
+    })
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        recount_profiles(User.objects.filter(pk=user_id))
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=Greatest(F('comments_count') + delta, 0))
+
+
+def get_profile(user):
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        recount_profiles(User.objects.filter(pk=user.pk))
+        return Profile.objects.get(user=user)
@@ -0,0 +1,32 @@
+from django.views.decorators.http import condition
+
+from .cache import FEED, generations_etag, post_generation
+from .cache import profile_generation
+
+
+def conditional_page(*generation_names, extra_generations=None):
+    """Отвечает 304 на If-None-Match, пока страница не могла измениться.
+
+    ETag считается до запросов представления по поколениям кеша,
+    пользователю (от него зависит шапка) и адресу страницы.
+    """
+    return condition(etag_func=generations_etag(
+        *generation_names,
+        per_user=True,
+        extra_generations=extra_generations,
+    ))
+
+
+def _profile_generations(request, username):
+    return (profile_generation(username),)
+
+
+def _post_generations(request, post_id):
+    return (post_generation(post_id),)
+
+
+conditional_feed = conditional_page(FEED)
+conditional_profile = conditional_page(
+    FEED, extra_generations=_profile_generations)
+conditional_post = conditional_page(
+    FEED, extra_generations=_post_generations)
@@ -0,0 +1,104 @@
+"""Atom-ленты постов для читалок и агрегаторов.
+
+Ленты строятся из тех же запросов, что и HTML-страницы, кешируются
+до смены поколения FEED одним ответом для всех читателей и отвечают
+304 на повторный опрос.
+"""
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import truncatechars
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from .cache import FEED, cache_feed, generations_etag
+from .models import Group, Post, User
+
+FEED_ITEMS = 20
+ITEM_TITLE_LENGTH = 30
+
+
+class PostsFeed(Feed):
+    feed_type = Atom1Feed
+    title = 'Yatube: последние записи'
+    subtitle = 'Новые посты всех авторов'
+    link = reverse_lazy('posts:index')
+
+    def items(self):
+        return Post.objects.for_feed()[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return truncatechars(item.text, ITEM_TITLE_LENGTH)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=(item.pk,))
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_author_link(self, item):
+        return reverse('posts:profile', args=(item.author.username,))
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_categories(self, item):
+        return (item.group.title,) if item.group else ()
+
+
+class GroupPostsFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: группа {group.title}'
+
+    def subtitle(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=(group.slug,))
+
+    def items(self, group):
+        return group.post_set.for_feed()[:FEED_ITEMS]
+
+
+class ProfilePostsFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: записи {author.username}'
+
+    def subtitle(self, author):
+        return f'Новые посты пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def items(self, author):
+        return Post.objects.for_feed().filter(author=author)[:FEED_ITEMS]
+
+
+def cached_feed(feed):
+    """Представление ленты с кешем и условным GET по поколению FEED.
+
+    Лента одна для всех, поэтому ни кеш, ни ETag от пользователя
+    не зависят.
+    """
+    def view(request, *args, **kwargs):
+        return feed(request, *args, **kwargs)
+    view.__name__ = type(feed).__name__
+    return condition(etag_func=generations_etag(FEED))(
+        cache_feed(FEED, per_user=False)(view))
+
+
+posts_feed = cached_feed(PostsFeed())
+group_feed = cached_feed(GroupPostsFeed())
+profile_feed = cached_feed(ProfilePostsFeed())
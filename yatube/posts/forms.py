@@ -1,13 +1,55 @@
+from functools import partial
+
 from django.contrib.auth.forms import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 
+from posts.images import check_upload, ingest_image
 from posts.models import Post, Comment
 
 
+def _image_to_python(field, data):
+    """ImageField.to_python, читающий картинку из самой загрузки.
+
+    ImageField копирует загрузку из памяти в BytesIO, здесь же
+    ограничения и структура картинки проверяются по файлу загрузки.
+    """
+    upload = forms.FileField.to_python(field, data)
+    if upload is None:
+        return None
+    check_upload(upload)
+    try:
+        image = Image.open(upload.file)
+        image.verify()
+    except Exception as error:
+        raise ValidationError(field.error_messages['invalid_image'],
+                              code='invalid_image') from error
+    finally:
+        upload.seek(0)
+    upload.image = image
+    upload.content_type = Image.MIME.get(image.format)
+    return upload
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ограничения на байты и пиксели проверяются до проверки
+        # картинки, без копии загрузки. Тип поля остаётся ImageField.
+        image = self.fields['image']
+        image.to_python = partial(_image_to_python, image)
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return ingest_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
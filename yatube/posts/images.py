@@ -0,0 +1,121 @@
+"""Приём загруженных картинок постов.
+
+Картинка проверяется по размеру файла и по числу пикселей ещё до
+декодирования, поворачивается по EXIF, уменьшается до допустимого
+размера и пересохраняется без метаданных. Для результата считается
+sha256, по которому одинаковые загрузки можно хранить один раз.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image, ImageOps
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_MAX_PIXELS = 40_000_000
+DEFAULT_MAX_DIMENSION = 2048
+JPEG_OPTIONS = {'quality': 85, 'optimize': True, 'progressive': True}
+PNG_OPTIONS = {'optimize': True}
+
+
+def _get_limit(name, default):
+    return getattr(settings, name, default)
+
+
+def _check_size(upload):
+    max_bytes = _get_limit('POSTS_IMAGE_MAX_BYTES', DEFAULT_MAX_BYTES)
+    if upload.size > max_bytes:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': max_bytes // (1024 * 1024)},
+        )
+
+
+def _too_many_pixels(max_pixels):
+    return ValidationError(
+        'Картинка больше %(limit)d мегапикселей.',
+        code='too_many_pixels',
+        params={'limit': max_pixels // 1_000_000},
+    )
+
+
+def _check_pixels(image):
+    max_pixels = _get_limit('POSTS_IMAGE_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+    width, height = image.size
+    if width * height > max_pixels:
+        raise _too_many_pixels(max_pixels)
+
+
+def check_upload(upload):
+    """Проверяет размер файла и число пикселей по заголовку картинки.
+
+    Картинка при этом не декодируется. Нечитаемый файл пропускается:
+    его отклонит проверка самой картинки.
+    """
+    _check_size(upload)
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            _check_pixels(image)
+    except Image.DecompressionBombError:
+        raise _too_many_pixels(
+            _get_limit('POSTS_IMAGE_MAX_PIXELS', DEFAULT_MAX_PIXELS))
+    except (OSError, ValueError):
+        pass
+    finally:
+        upload.seek(0)
+
+
+def _has_alpha(image):
+    return (image.mode in ('RGBA', 'LA', 'PA')
+            or 'transparency' in image.info)
+
+
+def _normalize(image):
+    """Поворачивает, уменьшает и приводит картинку к RGB или RGBA."""
+    max_dimension = _get_limit('POSTS_IMAGE_MAX_DIMENSION',
+                               DEFAULT_MAX_DIMENSION)
+    # JPEG можно сразу декодировать в уменьшенном масштабе.
+    image.draft('RGB', (max_dimension, max_dimension))
+    image = ImageOps.exif_transpose(image)
+    mode = 'RGBA' if _has_alpha(image) else 'RGB'
+    if image.mode != mode:
+        image = image.convert(mode)
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    return image
+
+
+def ingest_image(upload):
+    """Возвращает нормализованную копию загруженной картинки.
+
+    У результата есть атрибут content_hash — sha256 его содержимого.
+    Вызывает ValidationError, если картинка превышает ограничения
+    или не читается.
+    """
+    _check_size(upload)
+    upload.seek(0)
+    try:
+        with Image.open(upload) as original:
+            _check_pixels(original)
+            image = _normalize(original)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать картинку.',
+                              code='invalid_image')
+    if image.mode == 'RGBA':
+        image_format, extension, options = 'PNG', '.png', PNG_OPTIONS
+    else:
+        image_format, extension, options = 'JPEG', '.jpg', JPEG_OPTIONS
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    content_hash = hashlib.sha256(buffer.getbuffer()).hexdigest()
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    normalized = InMemoryUploadedFile(
+        buffer, getattr(upload, 'field_name', None), stem + extension,
+        Image.MIME[image_format], buffer.tell(), None,
+    )
+    normalized.content_hash = content_hash
+    return normalized
@@ -0,0 +1,114 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+from posts.seed import DEFAULT_SIZES, seed_dataset
+
+COLUMNS = ('scenario', 'requests', 'p50_ms', 'p95_ms', 'p99_ms', 'rps',
+           'queries', 'alloc_kib')
+
+
+class Command(BaseCommand):
+    help = ('Заполняет отдельную базу синтетическими данными и замеряет '
+            'время ответа представлений posts. Замер идёт с отдельным '
+            'пустым кешем в памяти.')
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_SIZES.items():
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать: {name}, по умолчанию {default}.'
+            )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора данных и запросов.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов на сценарий.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Запросов на прогрев перед замером.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Сколько потоков шлют запросы одновременно.'
+        )
+        parser.add_argument(
+            '--memory-requests', type=int, default=5,
+            help='Запросов для замера памяти, 0 отключает замер.'
+        )
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            choices=benchmark.SCENARIO_NAMES,
+            help='Какие сценарии гонять, по умолчанию все.'
+        )
+        parser.add_argument(
+            '--server', action='store_true',
+            help='Слать HTTP-запросы локальному WSGI-серверу, '
+                 'только GET-сценарии.'
+        )
+        parser.add_argument(
+            '--baseline', default=benchmark.BASELINE_PATH,
+            help='Файл с базовыми замерами.'
+        )
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Сравнить с базовыми замерами и упасть при регрессе.'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат как новые базовые замеры.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост p95 относительно базы, доля.'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = benchmark.get_scenarios(options['scenarios'])
+        if options['server']:
+            scenarios = tuple(scenario for scenario in scenarios
+                              if scenario.method == 'get')
+        with benchmark.benchmark_environment():
+            dataset = seed_dataset(
+                seed=options['seed'],
+                **{name: options[name] for name in DEFAULT_SIZES})
+            if options['server']:
+                with benchmark.local_server() as port:
+                    results = self._run(scenarios, dataset, options, port)
+            else:
+                results = self._run(scenarios, dataset, options)
+        self._report(results)
+        if options['save_baseline']:
+            benchmark.save_baseline(results, options['baseline'])
+        if options['compare']:
+            regressions = benchmark.compare_with_baseline(
+                results, benchmark.load_baseline(options['baseline']),
+                options['tolerance'])
+            if regressions:
+                raise CommandError('Регресс: ' + '; '.join(regressions))
+
+    def _run(self, scenarios, dataset, options, port=None):
+        try:
+            return [
+                benchmark.run_scenario(
+                    scenario, dataset,
+                    requests=options['requests'],
+                    concurrency=options['concurrency'],
+                    warmup=options['warmup'],
+                    memory_requests=options['memory_requests'],
+                    port=port,
+                    seed=options['seed'],
+                )
+                for scenario in scenarios
+            ]
+        except benchmark.BenchmarkError as error:
+            raise CommandError(error)
+
+    def _report(self, results):
+        self.stdout.write('\t'.join(COLUMNS))
+        for result in results:
+            self.stdout.write('\t'.join(
+                '-' if result[column] is None else str(result[column])
+                for column in COLUMNS))
@@ -0,0 +1,109 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts.models import Follow, Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.timeline import TIMELINE_ORDERING, timeline_entries
+from posts.views import COMMENTS_ON_PAGE, POSTS_ON_PAGE
+
+FEED_ORDERING = ('-pub_date', '-id')
+COMMENTS_ORDERING = ('-created', '-id')
+
+# Признаки полного просмотра таблицы или сортировки во временной
+# структуре для каждой поддерживаемой СУБД.
+BAD_PLAN_PATTERNS = {
+    'sqlite': (
+        re.compile(r'\bSCAN (TABLE )?\w+( AS \w+)?\s*$', re.MULTILINE),
+        re.compile(r'USE TEMP B-TREE'),
+    ),
+    'postgresql': (
+        re.compile(r'Seq Scan'),
+        re.compile(r'^\s*(->\s+)?Sort\b', re.MULTILINE),
+    ),
+}
+# Запросы страниц по курсору должны искать по индексу с границей
+# ключа, а не проходить индекс от начала.
+CURSOR_SUFFIX = '_cursor'
+SEEK_PATTERNS = {
+    'sqlite': re.compile(r'SEARCH .*\bINDEX \w+ \(.*[<>]\?\)'),
+    'postgresql': re.compile(r'Index Cond: .*[<>]'),
+}
+
+
+def _first_pk(model):
+    return model.objects.order_by('pk').values_list('pk', flat=True).first()
+
+
+def get_feed_queries():
+    """Запросы, которые выполняют представления ленты, по именам."""
+    user_id = _first_pk(User) or 0
+    group_id = _first_pk(Group) or 0
+    post = Post.objects.order_by('pk').first() or Post(pk=0)
+    feed = Post.objects.for_feed().order_by(*FEED_ORDERING)
+    key = (post.pub_date or timezone.now(), post.pk)
+    return {
+        'index': feed[:POSTS_ON_PAGE + 1],
+        'group_posts': feed.filter(group_id=group_id)[:POSTS_ON_PAGE + 1],
+        'profile': feed.filter(author_id=user_id)[:POSTS_ON_PAGE + 1],
+        'profile_following': Follow.objects.filter(
+            user_id=user_id, author_id=user_id),
+        'follow_index': timeline_entries(user_id).order_by(
+            *TIMELINE_ORDERING)[:POSTS_ON_PAGE + 1],
+        'post_detail_comments': post.comment_set.select_related(
+            'author').order_by(*COMMENTS_ORDERING)[:COMMENTS_ON_PAGE + 1],
+        'index_cursor': CursorPaginator(
+            feed, POSTS_ON_PAGE).cursor_queryset(key),
+        'group_posts_cursor': CursorPaginator(
+            feed.filter(group_id=group_id), POSTS_ON_PAGE,
+        ).cursor_queryset(key, reverse=True),
+        'follow_index_cursor': CursorPaginator(
+            timeline_entries(user_id), POSTS_ON_PAGE,
+            ordering=TIMELINE_ORDERING,
+        ).cursor_queryset(key),
+    }
+
+
+def is_bad_plan(name, plan, vendor):
+    if any(pattern.search(plan) for pattern in BAD_PLAN_PATTERNS[vendor]):
+        return True
+    return (name.endswith(CURSOR_SUFFIX)
+            and not SEEK_PATTERNS[vendor].search(plan))
+
+
+class Command(BaseCommand):
+    help = ('Выводит планы запросов ленты и завершается ошибкой, '
+            'если какой-то из них читает таблицу целиком '
+            'или сортирует без индекса.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'queries', nargs='*',
+            help='Имена проверяемых запросов, по умолчанию все.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in BAD_PLAN_PATTERNS:
+            raise CommandError(
+                f'Проверка планов для {connection.vendor} не поддерживается')
+        queries = get_feed_queries()
+        names = options['queries'] or list(queries)
+        unknown = set(names) - set(queries)
+        if unknown:
+            raise CommandError(f'Неизвестные запросы: {", ".join(unknown)}')
+        failed = []
+        for name in names:
+            plan = queries[name].explain()
+            bad = is_bad_plan(name, plan, connection.vendor)
+            if bad:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: FAIL'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+            if bad or options['verbosity'] > 1:
+                self.stdout.write(plan)
+        if failed:
+            raise CommandError(
+                f'Запросы без подходящего индекса: {", ".join(failed)}')
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+from posts.storage import count_references, walk_files
+from posts.thumbnails import forget_thumbnail
+
+UPLOAD_DIRECTORY = 'posts'
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки постов, на которые больше не ссылается '
+            'ни один пост, вместе с их миниатюрами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help='Не трогать файлы моложе стольких часов: они могут '
+                 'принадлежать ещё не сохранённому посту.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только вывести, что было бы удалено.'
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        if not storage.exists(UPLOAD_DIRECTORY):
+            return
+        references = count_references()
+        deadline = time.time() - options['min_age'] * 3600
+        removed = 0
+        for name in walk_files(storage, UPLOAD_DIRECTORY):
+            if name in references:
+                continue
+            if storage.get_modified_time(name).timestamp() > deadline:
+                continue
+            removed += 1
+            if options['dry_run']:
+                self.stdout.write(name)
+                continue
+            delete_thumbnails(ImageFile(name, storage))
+            forget_thumbnail(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов без ссылок: {removed}'))
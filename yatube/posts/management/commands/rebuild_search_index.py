@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import get_backend
+
+
+class Command(BaseCommand):
+    help = ('Заново строит поисковый индекс постов, например после '
+            'массовой загрузки в обход сигналов.')
+
+    def handle(self, *args, **options):
+        indexed = get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов в индексе: {indexed}'))
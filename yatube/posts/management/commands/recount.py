@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_comments, recount_profiles
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписчиков и комментариев, '
+            'если они разошлись с данными.')
+
+    def handle(self, *args, **options):
+        profiles = recount_profiles()
+        posts = recount_comments()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано профилей: {profiles}, постов: {posts}'))
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import seed
+
+
+class Command(BaseCommand):
+    help = ('Быстро заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками для нагрузочных замеров. '
+            'Строки вставляются пачками, после чего пересчитываются '
+            'счётчики, ленты подписок и поисковый индекс.')
+
+    def add_arguments(self, parser):
+        for name, default in seed.DEFAULT_SIZES.items():
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать: {name}, по умолчанию {default}.'
+            )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора, одинаковое даёт одинаковые данные.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Сколько процессов вставляют строки параллельно.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=seed.BATCH_SIZE,
+            help='Строк в одном INSERT.'
+        )
+        parser.add_argument(
+            '--password',
+            help='Общий пароль пользователей, без него войти нельзя.'
+        )
+        parser.add_argument(
+            '--no-images', action='store_false', dest='images',
+            help='Не прикладывать картинки к постам.'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers и --batch-size должны быть больше 0')
+        started = time.monotonic()
+        try:
+            ids = seed.bulk_seed(
+                seed=options['seed'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                password=options['password'],
+                images=options['images'],
+                log=self._log,
+                **{name: options[name] for name in seed.DEFAULT_SIZES})
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с, пользователи '
+            f'{ids["users"].start}..{ids["users"].stop - 1}'))
+
+    def _log(self, name, inserted, seconds):
+        rate = inserted / seconds * 60 if seconds else 0
+        self.stdout.write(f'{name}: {inserted} за {seconds:.1f} с, '
+                          f'{rate:.0f} строк в минуту')
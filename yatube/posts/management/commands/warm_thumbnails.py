@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnail, get_ready_thumbnail
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры для картинок постов, у которых их ещё нет, '
+            'и повторяет те, что создать не удалось.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько миниатюр создавать параллельно.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать и уже готовые миниатюры.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('image').iterator()
+        images = {post.image.name: post.image for post in posts
+                  if options['force'] or not get_ready_thumbnail(post.image)}
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(self._warm, images.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {results.count(True)}, '
+            f'ошибок: {results.count(False)}'))
+
+    def _warm(self, image):
+        try:
+            generate_thumbnail(image)
+        except Exception as error:
+            self.stderr.write(f'{image.name}: {error}')
+            return False
+        finally:
+            connection.close()
+        return True
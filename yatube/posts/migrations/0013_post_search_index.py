@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:52
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            'text, author_id UNINDEXED, group_id UNINDEXED, '
+            "tokenize='unicode61')"
+        )
+    except OperationalError:
+        # SQLite собран без FTS5: поиск будет работать без индекса.
+        return
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE} (rowid, text, author_id, group_id) '
+        'SELECT id, text, author_id, group_id FROM posts_post'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
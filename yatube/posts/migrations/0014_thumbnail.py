@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Thumbnail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=100, unique=True, verbose_name='картинка')),
+                ('version', models.PositiveSmallIntegerField(verbose_name='версия')),
+                ('picture', models.TextField(blank=True, verbose_name='описание')),
+                ('error', models.TextField(blank=True, verbose_name='ошибка')),
+            ],
+            options={
+                'verbose_name': 'Миниатюры',
+                'verbose_name_plural': 'Миниатюры',
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 POST_STRING_VIEW_LENGTH = 15
@@ -19,6 +21,16 @@ class Group(models.Model):
         verbose_name_plural = 'Группы'
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты со всем, что нужно для вывода в ленте, одним запросом."""
+        return self.select_related('author', 'group').defer(
+            'author__password',
+            'author__email',
+            'group__description',
+        )
+
+
 class Post(models.Model):
 
     def __str__(self):
@@ -27,6 +39,8 @@ class Post(models.Model):
     text = models.TextField(verbose_name='текст')
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='Дата публикации')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата изменения')
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name='posts',
@@ -40,13 +54,52 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='комментариев'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Посты'
         verbose_name_plural = 'Посты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='post_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=('image',), name='post_image_idx'),
+        )
+
+
+class Profile(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами."""
+
+    def __str__(self):
+        return str(self.user)
+
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                related_name='profile',
+                                verbose_name='пользователь')
+    posts_count = models.PositiveIntegerField(default=0,
+                                              verbose_name='постов')
+    followers_count = models.PositiveIntegerField(default=0,
+                                                  verbose_name='подписчиков')
+    following_count = models.PositiveIntegerField(default=0,
+                                                  verbose_name='подписок')
+
+    class Meta:
+        verbose_name = 'Профили'
+        verbose_name_plural = 'Профили'
 
 
 class Follow(models.Model):
@@ -64,6 +117,10 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('user', 'author')
+        indexes = (
+            models.Index(fields=('author', 'user'),
+                         name='follow_author_user_idx'),
+        )
 
 
 class Comment(models.Model):
@@ -85,3 +142,50 @@ class Comment(models.Model):
         verbose_name = 'Комментарии'
         verbose_name_plural = 'Комментарии'
         ordering = ('post', 'created')
+        indexes = (
+            models.Index(fields=('post', 'created'),
+                         name='comment_post_created_idx'),
+        )
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя, записанный при публикации."""
+
+    def __str__(self):
+        return f'{self.post_id} in {self.user}'
+
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             verbose_name='читатель')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             verbose_name='пост')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Лента подписок'
+        verbose_name_plural = 'Лента подписок'
+        unique_together = ('user', 'post')
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-id'),
+                         name='timeline_user_pub_date_idx'),
+        )
+
+
+class Thumbnail(models.Model):
+    """Готовый набор миниатюр картинки поста или ошибка его создания."""
+
+    def __str__(self):
+        return self.image
+
+    image = models.CharField(max_length=100, unique=True,
+                             verbose_name='картинка')
+    version = models.PositiveSmallIntegerField(verbose_name='версия')
+    picture = models.TextField(blank=True, verbose_name='описание')
+    error = models.TextField(blank=True, verbose_name='ошибка')
+
+    class Meta:
+        verbose_name = 'Миниатюры'
+        verbose_name_plural = 'Миниатюры'
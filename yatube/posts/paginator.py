@@ -0,0 +1,222 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+MAX_OFFSET_PAGES = 50
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} нельзя закодировать в курсор')
+
+
+def encode_cursor(values, reverse=False):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    payload = json.dumps([int(reverse), list(values)], default=_json_default)
+    token = base64.urlsafe_b64encode(payload.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает пару (значения ключа, направление) из токена."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        reverse, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(token)
+    if not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values, bool(reverse)
+
+
+def _no_number():
+    return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу сортировки вместо LIMIT/OFFSET.
+
+    Страница по курсору выбирается одним запросом по индексу
+    независимо от глубины. Ссылки вида ?page=N продолжают работать,
+    но смещение ограничено max_offset_pages страницами.
+    Возвращает обычные объекты Page с дополнительными атрибутами
+    next_cursor и previous_cursor. has_next и has_previous отвечают
+    по выборке страницы. У страниц по курсору нет номера (number
+    равен None), поэтому номера соседей и индексы записей у них тоже
+    None. Испорченный курсор или номер страницы не приводят
+    к ошибке: отдаётся последняя известная или первая страница.
+
+    Общее число записей считается не дальше count_limit строк
+    (по умолчанию — столько, сколько помещается в max_offset_pages);
+    count_limit=0 отключает подсчёт совсем. Если число записей уже
+    известно, его можно передать в count.
+
+    transform получает список записей страницы после вычисления
+    курсоров и возвращает то, что попадёт в page.object_list.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 max_offset_pages=MAX_OFFSET_PAGES, count=None,
+                 count_limit=None, transform=None, **kwargs):
+        self.ordering = tuple(ordering)
+        self.max_offset_pages = max_offset_pages
+        self.transform = transform
+        self.known_count = count
+        if count_limit is None:
+            count_limit = max_offset_pages * per_page
+        self.count_limit = count_limit
+        super().__init__(object_list.order_by(*self.ordering), per_page,
+                         **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if not self.count_limit:
+            return None
+        return self.object_list.order_by()[:self.count_limit + 1].count()
+
+    @property
+    def count_is_exact(self):
+        if self.known_count is not None:
+            return True
+        return self.count is not None and self.count <= self.count_limit
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return self.max_offset_pages
+        return min(super().num_pages, self.max_offset_pages)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return super().validate_number(number)
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return min(number, self.max_offset_pages)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        items = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not items and number > 1:
+            raise EmptyPage('На этой странице нет результатов')
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        return self._build_page(
+            items, number,
+            has_next=has_more,
+            has_previous=number > 1,
+        )
+
+    def cursor_page(self, token):
+        values, reverse = decode_cursor(token)
+        values = self._parse_key(values, token)
+        items = list(self.cursor_queryset(values, reverse))
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            if not has_more:
+                return self.page(1)
+            items.reverse()
+            return self._build_page(items, None,
+                                    has_next=True, has_previous=True)
+        return self._build_page(items, None,
+                                has_next=has_more, has_previous=True)
+
+    def cursor_queryset(self, values, reverse=False):
+        """Запрос записей после ключа values (перед ним при reverse)."""
+        queryset = self.object_list.filter(self._after(values, reverse))
+        if reverse:
+            queryset = queryset.reverse()
+        return queryset[:self.per_page + 1]
+
+    def get_page(self, number, cursor=None):
+        if cursor:
+            try:
+                return self.cursor_page(cursor)
+            except InvalidCursor:
+                pass
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            pass
+        if self.count:
+            try:
+                return self.page(self.num_pages)
+            except EmptyPage:
+                pass
+        return self.page(1)
+
+    def _build_page(self, items, number, has_next, has_previous):
+        page = self._get_page(items, number, self)
+        page.has_next = lambda: has_next
+        page.has_previous = lambda: has_previous
+        if number is None:
+            page.next_page_number = page.previous_page_number = _no_number
+            page.start_index = page.end_index = _no_number
+        page.next_cursor = None
+        page.previous_cursor = None
+        if items and has_next:
+            page.next_cursor = encode_cursor(self._key(items[-1]))
+        if items and has_previous:
+            page.previous_cursor = encode_cursor(self._key(items[0]),
+                                                 reverse=True)
+        if self.transform is not None:
+            page.object_list = self.transform(items)
+        return page
+
+    def _parse_key(self, values, token):
+        """Приводит значения из курсора к типам полей сортировки."""
+        if len(values) != len(self.ordering):
+            raise InvalidCursor(token)
+        opts = self.object_list.model._meta
+        parsed = []
+        for field, value in zip(self.ordering, values):
+            model_field = opts.get_field(field.lstrip('-'))
+            try:
+                value = model_field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise InvalidCursor(token)
+            if value is None:
+                raise InvalidCursor(token)
+            parsed.append(value)
+        return parsed
+
+    def _key(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def _after(self, values, reverse):
+        """Условие «строго после курсора» для составного ключа.
+
+        Цепочку OR база не превращает в поиск по индексу, поэтому
+        к ней добавлена граница по первому полю ключа.
+        """
+        first = self.ordering[0]
+        lookup = 'lte' if first.startswith('-') != reverse else 'gte'
+        bound = Q(**{f'{first.lstrip("-")}__{lookup}': values[0]})
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_field, value in zip(self.ordering[:index], values):
+                step &= Q(**{prev_field.lstrip('-'): value})
+            condition |= step
+        return bound & condition
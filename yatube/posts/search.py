@@ -0,0 +1,229 @@
+"""Полнотекстовый поиск по постам.
+
+Поиск идёт через бэкенд с общим интерфейсом SearchBackend. На SQLite
+используется таблица FTS5 posts_post_fts с ранжированием bm25, её
+создаёт миграция; на остальных базах — поиск подстрокой без индекса.
+Бэкенд можно заменить настройкой POSTS_SEARCH_BACKEND.
+Индекс обновляется сигналами при сохранении и удалении поста и при
+удалении группы, после массовой загрузки его перестраивает команда
+rebuild_search_index.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from django.shortcuts import get_object_or_404
+from django.utils.module_loading import import_string
+
+from .models import Group, Post, User
+from .paginator import CursorPaginator, InvalidCursor, decode_cursor
+from .paginator import encode_cursor
+
+FTS_TABLE = 'posts_post_fts'
+MAX_TERMS = 10
+
+_backends = {}
+
+
+def get_terms(query):
+    """Слова запроса без синтаксиса FTS и спецсимволов."""
+    return re.findall(r'\w+', query or '')[:MAX_TERMS]
+
+
+class SearchBackend:
+    """Интерфейс поискового бэкенда."""
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    def index_post(self, post):
+        """Добавляет или обновляет пост в индексе."""
+
+    def remove_post(self, post_id):
+        """Убирает пост из индекса."""
+
+    def remove_group(self, group_id):
+        """Убирает удалённую группу у постов в индексе."""
+
+    def rebuild(self):
+        """Заново строит индекс, возвращает число постов в нём."""
+        return 0
+
+    def filter(self, queryset, query):
+        """Оставляет в queryset посты, подходящие под запрос."""
+        raise NotImplementedError
+
+    def search(self, query, author_id=None, group_id=None, cursor=None,
+               limit=10):
+        """Возвращает id постов по убыванию релевантности и курсор
+        следующей страницы или None."""
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Поиск подстрокой: все слова должны встретиться в тексте.
+
+    Индекса нет, результаты идут от новых к старым.
+    """
+
+    def filter(self, queryset, query):
+        terms = get_terms(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(text__icontains=term)
+        return queryset
+
+    def search(self, query, author_id=None, group_id=None, cursor=None,
+               limit=10):
+        posts = self.filter(Post.objects.using(self.using), query)
+        if author_id is not None:
+            posts = posts.filter(author_id=author_id)
+        if group_id is not None:
+            posts = posts.filter(group_id=group_id)
+        paginator = CursorPaginator(posts.only('id', 'pub_date'), limit,
+                                    count_limit=0)
+        page = paginator.get_page(1, cursor=cursor)
+        return [post.id for post in page], page.next_cursor
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Индекс FTS5: слова ищутся по префиксу, порядок — bm25."""
+
+    def _execute(self, sql, params=()):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+
+    def index_post(self, post):
+        self.remove_post(post.pk)
+        self._execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text, author_id, group_id) '
+            'VALUES (%s, %s, %s, %s)',
+            (post.pk, post.text, post.author_id, post.group_id),
+        )
+
+    def remove_post(self, post_id):
+        self._execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                      (post_id,))
+
+    def remove_group(self, group_id):
+        self._execute(
+            f'UPDATE {FTS_TABLE} SET group_id = NULL WHERE group_id = %s',
+            (group_id,))
+
+    def rebuild(self):
+        self._execute(f'DELETE FROM {FTS_TABLE}')
+        self._execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text, author_id, group_id) '
+            f'SELECT id, text, author_id, group_id FROM {Post._meta.db_table}'
+        )
+        return self._execute(f'SELECT count(*) FROM {FTS_TABLE}')[0][0]
+
+    @staticmethod
+    def to_match(query):
+        return ' '.join(f'"{term}"*' for term in get_terms(query))
+
+    def filter(self, queryset, query):
+        match = self.to_match(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,),
+        ))
+
+    def search(self, query, author_id=None, group_id=None, cursor=None,
+               limit=10):
+        match = self.to_match(query)
+        if not match:
+            return [], None
+        sql = [f'SELECT rowid, rank FROM {FTS_TABLE} '
+               f'WHERE {FTS_TABLE} MATCH %s']
+        params = [match]
+        if author_id is not None:
+            sql.append('AND author_id = %s')
+            params.append(author_id)
+        if group_id is not None:
+            sql.append('AND group_id = %s')
+            params.append(group_id)
+        after = self._decode(cursor)
+        if after:
+            rank, rowid = after
+            sql.append('AND (rank > %s OR (rank = %s AND rowid > %s))')
+            params.extend((rank, rank, rowid))
+        sql.append('ORDER BY rank, rowid LIMIT %s')
+        params.append(limit + 1)
+        rows = self._execute(' '.join(sql), params)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_rowid, last_rank = rows[-1]
+            next_cursor = encode_cursor((last_rank, last_rowid))
+        return [rowid for rowid, rank in rows], next_cursor
+
+    @staticmethod
+    def _decode(cursor):
+        if not cursor:
+            return None
+        try:
+            values, reverse = decode_cursor(cursor)
+        except InvalidCursor:
+            return None
+        if reverse or len(values) != 2:
+            return None
+        rank, rowid = values
+        if not isinstance(rank, (int, float)) or not isinstance(rowid, int):
+            return None
+        return rank, rowid
+
+
+def _create_backend(using):
+    path = getattr(settings, 'POSTS_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)(using)
+    connection = connections[using]
+    if (connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()):
+        return SQLiteFTSBackend(using)
+    return SimpleSearchBackend(using)
+
+
+def get_backend(using='default'):
+    if using not in _backends:
+        _backends[using] = _create_backend(using)
+    return _backends[using]
+
+
+def search_posts(query, author=None, group=None, cursor=None, limit=10):
+    """Посты для вывода по запросу и курсор следующей страницы."""
+    ids, next_cursor = get_backend().search(
+        query,
+        author_id=author.pk if author else None,
+        group_id=group.pk if group else None,
+        cursor=cursor,
+        limit=limit,
+    )
+    posts = Post.objects.for_feed().in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts], next_cursor
+
+
+def get_search_params(params):
+    """Аргументы search_posts из GET-параметров q, author, group, cursor.
+
+    Неизвестные автор или группа дают 404.
+    """
+    search_params = {
+        'query': params.get('q', '').strip(),
+        'cursor': params.get('cursor'),
+        'author': None,
+        'group': None,
+    }
+    if params.get('author'):
+        search_params['author'] = get_object_or_404(
+            User, username=params['author'])
+    if params.get('group'):
+        search_params['group'] = get_object_or_404(
+            Group, slug=params['group'])
+    return search_params
@@ -0,0 +1,350 @@
+"""Синтетические данные для нагрузочных замеров.
+
+Авторы, группы и посты выбираются по степенному закону: у немногих
+авторов большая часть постов и подписчиков, у немногих постов —
+большая часть комментариев, как на живом сайте.
+
+Строки вставляются пачками через bulk_create в обход сигналов,
+поэтому после вставки счётчики, ленты подписок и поисковый индекс
+пересчитываются целиком. Данные делятся на куски по CHUNK_SIZE
+строк, у каждого куска свой генератор случайных чисел, так что
+одинаковый seed даёт одинаковые данные при любом числе процессов.
+"""
+import multiprocessing
+import random
+import time
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.color import no_style
+from django.db import connection, connections
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from . import search, timeline
+from .cache import FEED, GROUPS, bump_generation
+from .counters import recount_comments, recount_profiles
+from .models import Comment, Follow, Group, Post, User
+
+DEFAULT_SIZES = {
+    'users': 200,
+    'groups': 10,
+    'posts': 2000,
+    'comments': 5000,
+    'follows': 2000,
+}
+USERNAME_PREFIX = 'bench_'
+READER_FOLLOWS = 20
+IMAGE_SHARE = 0.3
+IMAGE_VARIANTS = 8
+IMAGE_SIZE = (1280, 720)
+POWER_LAW_EXPONENT = 1.2
+CHUNK_SIZE = 10000
+BATCH_SIZE = 2000
+START_DATE = datetime(2020, 1, 1, tzinfo=timezone.utc)
+POST_INTERVAL = timedelta(minutes=7)
+COMMENT_DELAY = timedelta(hours=48)
+WORDS = (
+    'котики', 'собаки', 'погода', 'город', 'поезд', 'книга', 'музыка',
+    'кофе', 'работа', 'отпуск', 'море', 'горы', 'лес', 'новости',
+    'фильм', 'спорт', 'футбол', 'код', 'питон', 'джанго', 'база',
+    'данных', 'сервер', 'утро', 'вечер', 'выходные', 'друзья', 'семья',
+    'рецепт', 'ужин', 'прогулка', 'фотография', 'история', 'планы',
+)
+SEEDED_MODELS = (User, Group, Post, Comment, Follow)
+
+Dataset = namedtuple('Dataset', 'users groups posts reader')
+# Всё, что нужно процессу, чтобы сгенерировать свой кусок строк.
+Plan = namedtuple('Plan', 'seed sizes first_ids password images')
+
+
+def power_law_weights(count, exponent=POWER_LAW_EXPONENT):
+    """Веса рангов 1..count: первые получают большую часть выбора."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def make_text(rng, min_words=10, max_words=60):
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return ' '.join(words).capitalize() + '.'
+
+
+def make_image(number):
+    color = ((number * 97) % 256, (number * 57) % 256, (number * 17) % 256)
+    buffer = BytesIO()
+    Image.new('RGB', IMAGE_SIZE, color).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name=f'bench_{number}.jpg')
+
+
+class _PowerLawChoice:
+    """Быстрый выбор id из диапазона с весами power_law_weights."""
+
+    def __init__(self, first_id, count):
+        self.ids = range(first_id, first_id + count)
+        self.cum_weights = list(accumulate(power_law_weights(count)))
+
+    def __call__(self, rng):
+        return rng.choices(self.ids, cum_weights=self.cum_weights)[0]
+
+
+def _chunk_rng(seed, table, chunk):
+    return random.Random(f'{seed}:{table}:{chunk}')
+
+
+def _user_rows(plan, start, stop):
+    first_id = plan.first_ids['users']
+    for index in range(start, stop):
+        yield User(id=first_id + index,
+                   username=f'{USERNAME_PREFIX}{first_id + index}',
+                   password=plan.password,
+                   date_joined=START_DATE)
+
+
+def _group_rows(plan, start, stop):
+    rng = _chunk_rng(plan.seed, 'groups', start // CHUNK_SIZE)
+    first_id = plan.first_ids['groups']
+    for index in range(start, stop):
+        yield Group(id=first_id + index,
+                    title=f'Группа {first_id + index}',
+                    slug=f'{USERNAME_PREFIX}group-{first_id + index}',
+                    description=make_text(rng))
+
+
+def _post_date(index):
+    return START_DATE + POST_INTERVAL * index
+
+
+def _post_rows(plan, start, stop):
+    rng = _chunk_rng(plan.seed, 'posts', start // CHUNK_SIZE)
+    choose_author = _PowerLawChoice(plan.first_ids['users'],
+                                    plan.sizes['users'])
+    choose_group = _PowerLawChoice(plan.first_ids['groups'],
+                                   plan.sizes['groups'] + 1)
+    last_group_id = plan.first_ids['groups'] + plan.sizes['groups']
+    first_id = plan.first_ids['posts']
+    for index in range(start, stop):
+        group_id = choose_group(rng)
+        image = ''
+        if plan.images and rng.random() < IMAGE_SHARE:
+            image = rng.choice(plan.images)
+        yield Post(id=first_id + index,
+                   author_id=choose_author(rng),
+                   group_id=None if group_id == last_group_id else group_id,
+                   text=make_text(rng),
+                   image=image,
+                   pub_date=_post_date(index),
+                   updated_at=_post_date(index))
+
+
+def _comment_rows(plan, start, stop):
+    rng = _chunk_rng(plan.seed, 'comments', start // CHUNK_SIZE)
+    choose_post = _PowerLawChoice(0, plan.sizes['posts'])
+    users = range(plan.first_ids['users'],
+                  plan.first_ids['users'] + plan.sizes['users'])
+    first_id = plan.first_ids['comments']
+    for index in range(start, stop):
+        post_index = choose_post(rng)
+        created = _post_date(post_index) + COMMENT_DELAY * rng.random()
+        yield Comment(id=first_id + index,
+                      post_id=plan.first_ids['posts'] + post_index,
+                      author_id=rng.choice(users),
+                      text=make_text(rng, 3, 20),
+                      created=created)
+
+
+def _follow_rows(plan, start, stop):
+    rng = _chunk_rng(plan.seed, 'follows', start // CHUNK_SIZE)
+    choose_author = _PowerLawChoice(plan.first_ids['users'],
+                                    plan.sizes['users'])
+    users = choose_author.ids
+    for _ in range(start, stop):
+        user_id = rng.choice(users)
+        author_id = choose_author(rng)
+        if user_id != author_id:
+            yield Follow(user_id=user_id, author_id=author_id)
+
+
+# Порядок важен: строки ссылаются на уже вставленные таблицы.
+TABLES = (
+    ('users', User, _user_rows),
+    ('groups', Group, _group_rows),
+    ('posts', Post, _post_rows),
+    ('comments', Comment, _comment_rows),
+    ('follows', Follow, _follow_rows),
+)
+ROW_FACTORIES = {name: (model, rows) for name, model, rows in TABLES}
+
+
+# SQLite пускает одного писателя, поэтому процессы генерируют строки
+# параллельно, а вставляют по очереди под этой блокировкой.
+_write_lock = None
+
+
+def _init_worker(write_lock):
+    global _write_lock
+    _write_lock = write_lock
+
+
+def _insert_chunk(task):
+    name, plan, start, stop, batch_size = task
+    model, rows = ROW_FACTORIES[name]
+    rows = rows(plan, start, stop)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        with _write_lock or nullcontext():
+            # Случайные подписки могут повториться, их пропускаем.
+            model.objects.bulk_create(batch,
+                                      ignore_conflicts=model is Follow)
+        batch = list(islice(rows, batch_size))
+
+
+@contextmanager
+def _explicit_dates():
+    """Отключает auto_now, чтобы вставить заданные даты."""
+    fields = [field for model in (Post, Comment)
+              for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _save_images(count):
+    storage = Post._meta.get_field('image').storage
+    return tuple(storage.save(f'posts/{image.name}', image)
+                 for image in map(make_image, range(count)))
+
+
+def _reset_sequences():
+    statements = connection.ops.sequence_reset_sql(no_style(), SEEDED_MODELS)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _insert_tables(plan, workers, batch_size, log):
+    pool = None
+    if workers > 1:
+        context = multiprocessing.get_context('fork')
+        write_lock = context.Lock() if connection.vendor == 'sqlite' else None
+        # Дочерние процессы откроют свои соединения.
+        connections.close_all()
+        pool = context.Pool(workers, _init_worker, (write_lock,))
+    try:
+        for name, model, rows in TABLES:
+            started = time.monotonic()
+            tasks = [(name, plan, start,
+                      min(start + CHUNK_SIZE, plan.sizes[name]), batch_size)
+                     for start in range(0, plan.sizes[name], CHUNK_SIZE)]
+            # Подписки на себя и повторы пропускаются, поэтому
+            # вставленные строки считаем по таблице.
+            before = model.objects.count()
+            if pool is None:
+                for task in tasks:
+                    _insert_chunk(task)
+            else:
+                pool.map(_insert_chunk, tasks)
+            if log is not None:
+                log(name, model.objects.count() - before,
+                    time.monotonic() - started)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def rebuild_derived(users=None, posts=None, log=None):
+    """Пересчитывает то, что при обычной записи делают сигналы."""
+    steps = (
+        ('profiles', lambda: recount_profiles(users)),
+        ('comments_count', lambda: recount_comments(posts)),
+        ('timelines', lambda: timeline.rebuild(users)),
+        ('search', lambda: search.get_backend().rebuild()),
+    )
+    for name, step in steps:
+        started = time.monotonic()
+        done = step()
+        if log is not None:
+            log(name, done, time.monotonic() - started)
+    bump_generation(FEED, GROUPS)
+
+
+def bulk_seed(users=DEFAULT_SIZES['users'],
+              groups=DEFAULT_SIZES['groups'],
+              posts=DEFAULT_SIZES['posts'],
+              comments=DEFAULT_SIZES['comments'],
+              follows=DEFAULT_SIZES['follows'],
+              seed=0, workers=1, batch_size=BATCH_SIZE, password=None,
+              images=True, log=None):
+    """Вставляет данные пачками, возвращает диапазоны id по таблицам.
+
+    Новые строки получают id после уже существующих. Пароль у всех
+    пользователей один, его хеш считается один раз; без пароля
+    войти под ними нельзя. Комментарии и подписки выбираются
+    случайно, поэтому повторяющиеся подписки отбрасываются
+    и их выходит чуть меньше заказанного.
+    """
+    if posts and not users:
+        raise ValueError('Постам нужны авторы')
+    if comments and not posts:
+        raise ValueError('Комментариям нужны посты')
+    sizes = {'users': users, 'groups': groups, 'posts': posts,
+             'comments': comments, 'follows': follows if users > 1 else 0}
+    plan = Plan(
+        seed=seed,
+        sizes=sizes,
+        first_ids={name: _next_id(model) for name, model, _ in TABLES},
+        password=make_password(password),
+        images=_save_images(IMAGE_VARIANTS) if images and posts else (),
+    )
+    with _explicit_dates():
+        _insert_tables(plan, workers, batch_size, log)
+    _reset_sequences()
+    ids = {name: range(plan.first_ids[name], plan.first_ids[name] + size)
+           for name, size in sizes.items()}
+    user_ids = ids['users']
+    if users > 1:
+        # Последний пользователь читает самых популярных авторов.
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_ids[-1], author_id=author_id)
+             for author_id in user_ids[:min(READER_FOLLOWS, users - 1)]],
+            ignore_conflicts=True)
+    rebuild_derived(_in_range(User.objects, user_ids),
+                    _in_range(Post.objects, ids['posts']), log)
+    return ids
+
+
+def _in_range(queryset, ids):
+    return queryset.filter(pk__gte=ids.start, pk__lt=ids.stop)
+
+
+def seed_dataset(users=DEFAULT_SIZES['users'],
+                 groups=DEFAULT_SIZES['groups'],
+                 posts=DEFAULT_SIZES['posts'],
+                 comments=DEFAULT_SIZES['comments'],
+                 follows=DEFAULT_SIZES['follows'],
+                 seed=0, workers=1):
+    """Заполняет базу и возвращает созданные объекты для замеров."""
+    ids = bulk_seed(users, groups, posts, comments, follows,
+                    seed=seed, workers=workers)
+    user_list = list(_in_range(User.objects, ids['users']).order_by('pk'))
+    group_list = list(_in_range(Group.objects, ids['groups']).order_by('pk'))
+    post_list = list(_in_range(Post.objects.only('pk'), ids['posts'])
+                     .order_by('pk'))
+    reader = user_list[-1] if user_list else None
+    return Dataset(user_list, group_list, post_list, reader)
@@ -0,0 +1,77 @@
+"""Хранилище картинок постов по хешу содержимого.
+
+Файл сохраняется под именем posts/ab/cd/<sha256>.<расширение>, поэтому
+одинаковые загрузки занимают место один раз и делят миниатюры, а
+совпадение исходных имён файлов больше не важно. Один файл может
+принадлежать нескольким постам; файлы, на которые никто не ссылается,
+удаляет команда gc_media.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count
+from django.utils.deconstruct import deconstructible
+
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+def get_content_hash(content):
+    """sha256 содержимого; готовый хеш берётся из content_hash."""
+    content_hash = getattr(content, 'content_hash', None)
+    if content_hash:
+        return content_hash
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def get_hashed_name(name, content_hash):
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    shards = [content_hash[index * SHARD_WIDTH:(index + 1) * SHARD_WIDTH]
+              for index in range(SHARD_DEPTH)]
+    return os.path.join(directory, *shards, content_hash + extension)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = get_hashed_name(name, get_content_hash(content))
+        if self.exists(name):
+            # Свежая дата изменения не даёт gc_media удалить файл,
+            # пока пост с ним ещё не сохранён.
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass
+        return super().save(name, content, max_length=max_length)
+
+
+def count_references(names=None):
+    """Сколько постов ссылается на каждый файл: {имя: число}."""
+    from posts.models import Post
+
+    posts = Post.objects.exclude(image='')
+    if names is not None:
+        posts = posts.filter(image__in=names)
+    return dict(posts.values_list('image').annotate(Count('id'))
+                .order_by())
+
+
+def walk_files(storage, directory):
+    """Все файлы каталога хранилища вместе с подкаталогами."""
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield os.path.join(directory, name)
+    for subdirectory in directories:
+        yield from walk_files(storage, os.path.join(directory, subdirectory))
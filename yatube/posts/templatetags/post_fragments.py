@@ -0,0 +1,48 @@
+from django import template
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from posts.cache import GROUPS, POST_FRAGMENT_TIMEOUT, get_generation
+from posts.cache import post_fragment_key
+from posts.thumbnails import get_ready_thumbnails
+
+register = template.Library()
+
+POST_TEMPLATE = 'includes/post_data.html'
+
+
+@register.simple_tag(takes_context=True)
+def load_post_fragments(context, posts):
+    """Готовит HTML постов страницы, забирая его из кеша разом.
+
+    Возвращает словарь {id поста: HTML} для вывода тегом post_fragment
+    внутри цикла по постам. Отсутствующие в кеше посты рендерятся
+    шаблоном post_data.html в текущем контексте и сохраняются одним
+    set_many. Посты, чья миниатюра ещё создаётся, не кешируются, чтобы
+    не закрепить заглушку.
+    """
+    view_name = context['request'].resolver_match.view_name
+    groups_generation = get_generation(GROUPS)
+    keys = {post_fragment_key(post, view_name, groups_generation): post
+            for post in posts}
+    fragments = cache.get_many(keys)
+    rendered = {}
+    post_template = context.template.engine.get_template(POST_TEMPLATE)
+    for key, post in keys.items():
+        if key not in fragments:
+            with context.push(post=post):
+                rendered[key] = post_template.render(context)
+    if rendered:
+        ready = get_ready_thumbnails(keys[key].image for key in rendered)
+        cache.set_many({
+            key: html for key, html in rendered.items()
+            if not keys[key].image or keys[key].image.name in ready
+        }, POST_FRAGMENT_TIMEOUT)
+        fragments.update(rendered)
+    return {post.pk: fragments[key] for key, post in keys.items()}
+
+
+@register.simple_tag
+def post_fragment(fragments, post):
+    """Выводит подготовленный load_post_fragments HTML поста."""
+    return mark_safe(fragments[post.pk])
@@ -0,0 +1,15 @@
+from django import template
+
+from posts.thumbnails import THUMBNAIL_SIZES, schedule_thumbnail
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_picture(post):
+    """Адаптивная картинка поста или заглушка, пока миниатюры создаются.
+
+    Браузер сам выбирает формат из <source> и ширину из srcset.
+    """
+    picture = schedule_thumbnail(post.image)
+    return {'post': post, 'picture': picture, 'sizes': THUMBNAIL_SIZES}
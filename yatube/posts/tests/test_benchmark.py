@@ -0,0 +1,58 @@
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from posts import benchmark
+from posts.models import Follow
+from posts.seed import seed_dataset
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            MEDIA_ROOT=cls.media_root, POSTS_THUMBNAIL_WORKERS=0)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.dataset = seed_dataset(users=5, groups=2, posts=12, comments=6,
+                                    follows=5, seed=1)
+
+    def test_every_scenario_runs(self):
+        for scenario in benchmark.SCENARIOS:
+            with self.subTest(scenario=scenario.name):
+                result = benchmark.run_scenario(
+                    scenario, self.dataset, requests=3, warmup=1,
+                    memory_requests=1)
+                self.assertEqual(result['requests'], 3)
+                self.assertGreater(result['queries'], 0)
+                self.assertGreater(result['alloc_kib'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_reader_follows_authors(self):
+        reader = self.dataset.reader
+        self.assertTrue(Follow.objects.filter(user=reader).exists())
+        self.assertEqual(len(self.dataset.posts), 12)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+
+    def test_compare_with_baseline(self):
+        baseline = {'index': {'p95_ms': 10.0, 'queries': 2}}
+        same = [{'scenario': 'index', 'p95_ms': 12.0, 'queries': 2}]
+        slower = [{'scenario': 'index', 'p95_ms': 20.0, 'queries': 3}]
+        self.assertEqual(benchmark.compare_with_baseline(same, baseline), [])
+        self.assertEqual(
+            len(benchmark.compare_with_baseline(slower, baseline)), 2)
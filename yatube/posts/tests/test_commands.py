@@ -0,0 +1,130 @@
+import os
+import re
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import Comment, Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class ExplainFeedsCommandTests(TestCase):
+    def test_feed_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_feeds', 'index', 'group_posts', 'profile',
+                     'post_detail_comments', 'index_cursor',
+                     'group_posts_cursor', 'follow_index_cursor', stdout=out)
+        self.assertNotIn('FAIL', out.getvalue())
+
+
+class RebuildTimelinesCommandTests(TestCase):
+    @mock.patch('posts.timeline.TIMELINE_LENGTH', 3)
+    def test_keeps_newest_entries_per_reader(self):
+        reader = User.objects.create_user(username='Reader')
+        posts = []
+        for name in ('First', 'Second'):
+            author = User.objects.create_user(username=name)
+            posts += [Post.objects.create(author=author, text=str(number))
+                      for number in range(2)]
+            Follow.objects.create(user=reader, author=author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(reader.timeline_entries.order_by('-pub_date', '-id')
+                 .values_list('post', flat=True)),
+            [post.pk for post in reversed(posts[1:])])
+
+
+class GcMediaCommandTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.storage = Post._meta.get_field('image').storage
+
+    def test_removes_only_orphans(self):
+        user = User.objects.create_user(username='HasNoName')
+        post = Post.objects.create(author=user, text='Текст')
+        post.image.save('kept.jpg', ContentFile(b'kept'))
+        orphan = self.storage.save('posts/orphan.jpg', ContentFile(b'orphan'))
+
+        call_command('gc_media', '--min-age', '0', stdout=StringIO())
+
+        self.assertTrue(self.storage.exists(post.image.name))
+        self.assertFalse(self.storage.exists(orphan))
+
+    def test_keeps_recent_files(self):
+        orphan = self.storage.save('posts/orphan.jpg', ContentFile(b'orphan'))
+        call_command('gc_media', stdout=StringIO())
+        self.assertTrue(self.storage.exists(orphan))
+
+    def test_reused_file_counts_as_recent(self):
+        orphan = self.storage.save('posts/orphan.jpg', ContentFile(b'orphan'))
+        os.utime(self.storage.path(orphan), (0, 0))
+        self.storage.save('posts/again.jpg', ContentFile(b'orphan'))
+        call_command('gc_media', stdout=StringIO())
+        self.assertTrue(self.storage.exists(orphan))
+
+
+class SeedDataCommandTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def test_fills_tables_and_derived_data(self):
+        call_command('seed_data', '--users', '6', '--groups', '2',
+                     '--posts', '40', '--comments', '30', '--follows', '10',
+                     '--batch-size', '7', '--password', 'pass',
+                     stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 6)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 30)
+        reader = User.objects.order_by('pk').last()
+        self.assertTrue(reader.check_password('pass'))
+        self.assertEqual(reader.profile.following_count,
+                         Follow.objects.filter(user=reader).count())
+        for post in Post.objects.all():
+            self.assertEqual(post.comments_count, post.comment_set.count())
+        followed = Post.objects.filter(author__following__user=reader)
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=reader)
+                .values_list('post_id', flat=True)),
+            set(followed.values_list('pk', flat=True)),
+        )
+
+    def test_logs_inserted_rows(self):
+        output = StringIO()
+        call_command('seed_data', '--users', '4', '--posts', '10',
+                     '--comments', '0', '--follows', '30', '--no-images',
+                     stdout=output)
+        logged = dict(re.findall(r'^(\w+): (\d+) за ', output.getvalue(),
+                                 re.MULTILINE))
+        self.assertEqual(int(logged['follows']), Follow.objects.count())
+        self.assertLess(Follow.objects.count(), 30)
+        self.assertEqual(int(logged['timelines']),
+                         TimelineEntry.objects.count())
+
+    def test_same_seed_gives_same_texts(self):
+        call_command('seed_data', '--users', '3', '--posts', '5',
+                     '--comments', '0', '--follows', '0', '--no-images',
+                     stdout=StringIO())
+        first = list(Post.objects.order_by('pk').values_list('text', 'image'))
+        Post.objects.all().delete()
+        call_command('seed_data', '--users', '3', '--posts', '5',
+                     '--comments', '0', '--follows', '0', '--no-images',
+                     stdout=StringIO())
+        second = list(Post.objects.order_by('pk').values_list('text', 'image'))
+        self.assertEqual(first, second)
@@ -1,8 +1,16 @@
+import hashlib
+from io import BytesIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+
+from posts.forms import PostForm
 from posts.models import Group, Post, Comment
+from posts.thumbnails import get_ready_thumbnail
 
 User = get_user_model()
 
@@ -70,6 +78,15 @@ class TaskCreateFormTests(TestCase):
                 group=self.group
             ).exists())
 
+    @override_settings(POSTS_THUMBNAIL_WORKERS=0)
+    def test_create_post_generates_thumbnail(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': self.image},
+        )
+        post = Post.objects.get(text='С картинкой')
+        self.assertIsNotNone(get_ready_thumbnail(post.image))
+
     def test_wrong_file_upload(self):
         posts_count = Post.objects.count()
         form_data = {
@@ -110,6 +127,22 @@ class TaskCreateFormTests(TestCase):
 
         self.assertNotEqual(posts_data, Post.objects.filter(id=self.post.id))
 
+    def test_edit_keeps_comments_added_meanwhile(self):
+        is_valid = PostForm.is_valid
+
+        def comment_then_validate(form):
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text='Пока правили пост')
+            return is_valid(form)
+
+        with mock.patch.object(PostForm, 'is_valid', comment_then_validate):
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+                data={'text': 'измененный текст'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'измененный текст')
+        self.assertEqual(self.post.comments_count, 1)
+
     def test_create_comment(self):
         """Валидная форма создает запись в Comment."""
         comments_count = Comment.objects.filter(post=self.post).count()
@@ -134,3 +167,76 @@ class TaskCreateFormTests(TestCase):
             Comment.objects.filter(
                 text='Тестовый текст комментария'
             ).exists())
+
+
+class PostFormImageTests(TestCase):
+    @staticmethod
+    def make_upload(size=(3000, 1000), orientation=None, name='photo.jpg'):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        Image.new('RGB', size, (200, 10, 10)).save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue(),
+                                  content_type='image/jpeg')
+
+    def clean_image(self, upload):
+        form = PostForm(data={'text': 'Текст'}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.cleaned_data['image']
+
+    def test_image_is_normalized(self):
+        image = self.clean_image(self.make_upload(orientation=6))
+        with Image.open(image) as stored:
+            self.assertEqual(stored.size, (683, 2048))
+            self.assertNotIn(0x0112, stored.getexif())
+        image.seek(0)
+        self.assertEqual(image.content_hash,
+                         hashlib.sha256(image.read()).hexdigest())
+
+    def test_identical_uploads_share_file(self):
+        user = User.objects.create_user(username='Uploader')
+        client = Client()
+        client.force_login(user)
+        for name in ('a.jpg', 'b.jpg'):
+            client.post(reverse('posts:post_create'), data={
+                'text': name, 'image': self.make_upload(name=name)})
+        first, second = Post.objects.filter(author=user)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+
+    def test_identical_uploads_have_same_hash(self):
+        first = self.clean_image(self.make_upload(name='a.jpg'))
+        second = self.clean_image(self.make_upload(name='b.jpg'))
+        self.assertEqual(first.content_hash, second.content_hash)
+
+    @override_settings(POSTS_IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels(self):
+        form = PostForm(data={'text': 'Текст'},
+                        files={'image': self.make_upload()})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(POSTS_IMAGE_MAX_PIXELS=1000)
+    def test_limits_checked_before_decoding(self):
+        with mock.patch('PIL.ImageFile.ImageFile.verify') as verify:
+            form = PostForm(data={'text': 'Текст'},
+                            files={'image': self.make_upload()})
+            self.assertFalse(form.is_valid())
+        verify.assert_not_called()
+
+    def test_upload_is_not_copied_for_verification(self):
+        with mock.patch('django.forms.fields.BytesIO') as copy:
+            image = self.clean_image(self.make_upload())
+        copy.assert_not_called()
+        self.assertEqual(image.content_type, 'image/jpeg')
+
+    @override_settings(POSTS_IMAGE_MAX_BYTES=100)
+    def test_file_too_large(self):
+        form = PostForm(data={'text': 'Текст'},
+                        files={'image': self.make_upload()})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
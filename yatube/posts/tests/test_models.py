@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..counters import recount_comments, recount_profiles
+from ..models import Comment, Follow, Group, Post, Profile
 
 User = get_user_model()
 
@@ -32,3 +33,51 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class ProfileCountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.author = User.objects.create_user(username='author')
+
+    def test_counters_follow_creates_and_deletes(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text='Комментарий')
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        author_profile = Profile.objects.get(user=self.author)
+        user_profile = Profile.objects.get(user=self.user)
+        post.refresh_from_db()
+        self.assertEqual(author_profile.posts_count, 1)
+        self.assertEqual(author_profile.followers_count, 1)
+        self.assertEqual(user_profile.following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        author_profile.refresh_from_db()
+        user_profile.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(author_profile.followers_count, 0)
+        self.assertEqual(user_profile.following_count, 0)
+
+        post.delete()
+        author_profile.refresh_from_db()
+        self.assertEqual(author_profile.posts_count, 0)
+
+    def test_recount_repairs_drift(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=str(i)) for i in range(3))
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.user, text=str(i))
+            for i in range(2))
+        Profile.objects.filter(user=self.user).delete()
+
+        recount_profiles()
+        recount_comments()
+        post.refresh_from_db()
+        self.assertEqual(Profile.objects.get(user=self.author).posts_count, 4)
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+        self.assertEqual(post.comments_count, 2)
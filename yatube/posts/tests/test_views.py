@@ -1,12 +1,30 @@
+from base64 import urlsafe_b64encode
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.models.fields.files import ImageFieldFile
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.core.paginator import Page
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 from django.core.cache import cache
-from posts.models import Group, Post, Follow
-from posts.views import POSTS_ON_PAGE
+from posts.cache import FEED, get_generation, get_generations
+from posts.cache import post_generation
+from posts.models import Comment, Group, Post, Follow, Thumbnail
+from posts.paginator import CursorPaginator
+from posts.search import get_backend
+from posts.signals import invalidate_follow
+from posts.views import COMMENTS_ON_PAGE, POSTS_ON_PAGE, get_page_window
+from posts.tests.utils import OnCommitMixin, QueryBudgetMixin
+from posts.thumbnails import (forget_thumbnail, generate_thumbnail,
+                              get_ready_thumbnail, schedule_thumbnail)
+from core.perf.queries import inspect_queries
 
 User = get_user_model()
 
@@ -256,8 +274,80 @@ class PaginatorViewsPosts(TestCase):
         self.assertEqual(len(response.context.get('page_obj').object_list),
                          self.count_of_posts_seconds_page)
 
+    def test_cursor_pages_follow_each_other(self):
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        first_page = self.authorized_client.get(url).context['page_obj']
+        response = self.authorized_client.get(
+            url, {'cursor': first_page.next_cursor})
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page.object_list),
+                         self.count_of_posts_seconds_page)
+        self.assertFalse(set(first_page.object_list)
+                         & set(second_page.object_list))
+        self.assertIsNone(second_page.next_cursor)
+
+        response = self.authorized_client.get(
+            url, {'cursor': second_page.previous_cursor})
+        self.assertEqual(list(response.context['page_obj'].object_list),
+                         list(first_page.object_list))
+
+    def test_page_window_is_bounded(self):
+        paginator = CursorPaginator(Post.objects.all(), 1)
+        window = get_page_window(paginator.get_page(8))
+        self.assertEqual(window, [1, None, 6, 7, 8, 9, 10, None, 15])
+
+        paginator = CursorPaginator(Post.objects.all(), 1, count_limit=0)
+        window = get_page_window(paginator.get_page(8))
+        self.assertEqual(window, [1, None, 6, 7, 8, 9, 10, None])
+
+    def test_broken_cursor_falls_back_to_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'broken', 'page': 2})
+        self.assertEqual(len(response.context.get('page_obj').object_list),
+                         self.count_of_posts_seconds_page)
 
-class CacheViewsPosts(TestCase):
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        post = Post.objects.first()
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:api_index'),
+            reverse('posts:post_comments', kwargs={'post_id': post.pk}),
+        )
+        for values in ('[0,["abc","def"]]', '[0,[1,2]]', '[0,[null,1]]',
+                       '[0,5]', '{"a":1,"b":2}'):
+            cursor = urlsafe_b64encode(values.encode()).decode()
+            for url in urls:
+                with self.subTest(values=values, url=url):
+                    response = self.authorized_client.get(
+                        url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+
+    def test_out_of_range_page_without_count(self):
+        for page in (0, 5, 999, 'abc'):
+            with self.subTest(page=page):
+                response = self.authorized_client.get(
+                    reverse('posts:api_index'), {'page': page})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']),
+                                 self.count_of_posts)
+        paginator = CursorPaginator(Post.objects.all(), POSTS_ON_PAGE,
+                                    count_limit=0)
+        self.assertEqual(paginator.get_page(5).number, 1)
+
+    def test_cursor_page_neighbours(self):
+        paginator = CursorPaginator(Post.objects.all(), POSTS_ON_PAGE,
+                                    count_limit=0)
+        first_page = paginator.get_page(1)
+        page = paginator.get_page(1, cursor=first_page.next_cursor)
+        self.assertIs(type(page), Page)
+        self.assertIsNone(page.number)
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+        self.assertIsNone(page.next_page_number())
+        self.assertIsNone(page.start_index())
+
+
+class CacheViewsPosts(OnCommitMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -293,22 +383,41 @@ class CacheViewsPosts(TestCase):
     def test_posts_cache_index(self):
         response = (self.guest_client.get(reverse('posts:index')))
         content = response.content
-        self.post.delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
 
         response = (self.guest_client.get(reverse('posts:index')))
+        self.assertEqual(content, response.content)
 
-        content_after_delete = response.content
+        cache.clear()
+        response = (self.guest_client.get(reverse('posts:index')))
+        self.assertNotEqual(content, response.content)
 
-        self.assertEqual(content, content_after_delete)
+    def test_posts_cache_index_invalidated_on_change(self):
+        response = (self.guest_client.get(reverse('posts:index')))
+        content = response.content
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
 
-        cache.clear()
         response = (self.guest_client.get(reverse('posts:index')))
-        content_after_clean = response.content
+        self.assertNotEqual(content, response.content)
+        self.assertNotIn(self.post, response.context['page_obj'])
+
+    def test_generation_bumped_after_commit(self):
+        generation = get_generation(FEED)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post.delete()
+            self.assertEqual(get_generation(FEED), generation)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_generation(FEED), generation)
 
-        self.assertNotEqual(content, content_after_clean)
+    def test_posts_cache_index_varies_on_user(self):
+        self.guest_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, self.user.username)
 
 
-class FollowViewTests(TestCase):
+class FollowViewTests(OnCommitMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -331,6 +440,11 @@ class FollowViewTests(TestCase):
         self.authorized_second_client = Client()
         self.authorized_second_client.force_login(self.second_user)
 
+    def test_follow_invalidation_reads_usernames_at_once(self):
+        follow = Follow(user_id=self.user.pk, author_id=self.second_user.pk)
+        with self.assertNumQueries(1):
+            invalidate_follow(Follow, follow)
+
     def test_views_authorized_client_try_follow(self):
         follow_count = Follow.objects.all().count()
         self.authorized_client.get(
@@ -364,6 +478,47 @@ class FollowViewTests(TestCase):
         posts = response.context.get('page_obj').object_list
         self.assertIn(self.follow_post, posts)
 
+    def test_views_follow_backfills_and_unfollow_prunes(self):
+        old_post = Post.objects.create(author=self.second_user,
+                                       text='Старый пост')
+        self.authorized_client.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': self.second_user}))
+        url = reverse('posts:follow_index')
+        posts = self.authorized_client.get(url).context['page_obj']
+        self.assertIn(old_post, posts.object_list)
+
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.second_user}))
+        posts = self.authorized_client.get(url).context['page_obj']
+        self.assertNotIn(old_post, posts.object_list)
+
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 0)
+    @mock.patch('posts.timeline.FANOUT_BATCH_SIZE', 1)
+    def test_views_popular_author_posts_fanned_out_after_commit(self):
+        third_user = User.objects.create_user(username='ThirdUser')
+        Follow.objects.create(user=self.user, author=self.second_user)
+        Follow.objects.create(user=third_user, author=self.second_user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            new_post = Post.objects.create(author=self.second_user,
+                                           text='Пост популярного автора')
+        self.assertFalse(new_post.timeline_entries.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            set(new_post.timeline_entries.values_list('user', flat=True)),
+            {self.user.pk, third_user.pk})
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'].object_list)
+
+    def test_views_follow_index_does_not_write(self):
+        Follow.objects.create(user=self.user, author=self.second_user)
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith('INSERT')])
+
     def test_views_unfollowing_user_not_get_new_post(self):
         url = reverse('posts:profile_follow',
                       kwargs={'username': self.second_user})
@@ -375,3 +530,454 @@ class FollowViewTests(TestCase):
         response = self.authorized_client.get(url)
         posts = response.context.get('page_obj').object_list
         self.assertNotIn(self.follow_post, posts)
+
+
+class FeedQueriesTests(QueryBudgetMixin, TestCase):
+    """Число запросов на страницу не зависит от числа постов на ней."""
+
+    QUERY_BUDGETS = {
+        'posts:index': 4,
+        'posts:group_list': 5,
+        'posts:profile': 5,
+        'posts:follow_index': 4,
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='HasNoName')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.author = User.objects.create_user(username='Author')
+        Follow.objects.create(user=self.user, author=self.author)
+        for i in range(POSTS_ON_PAGE):
+            group = Group.objects.create(
+                title=f'Группа {i}',
+                slug=f'group-{i}',
+                description='Тестовое описание',
+            )
+            Post.objects.create(author=self.author, text=str(i),
+                                group=group)
+            Post.objects.create(author=self.author, text=str(i),
+                                group=self.group)
+        cache.clear()
+
+    def test_feed_pages_fit_query_budget(self):
+        kwargs = {
+            'posts:group_list': {'slug': self.group.slug},
+            'posts:profile': {'username': self.author.username},
+        }
+        for view_name, budget in self.QUERY_BUDGETS.items():
+            with self.subTest(view_name=view_name):
+                url = reverse(view_name, kwargs=kwargs.get(view_name))
+                self.assertQueryBudget(self.authorized_client, url, budget)
+
+    def test_pages_do_not_repeat_queries(self):
+        post = Post.objects.filter(author=self.author).first()
+        for i in range(3):
+            commenter = User.objects.create_user(username=f'Commenter{i}')
+            Comment.objects.create(post=post, author=commenter, text=str(i))
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=(post.pk,)),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with inspect_queries(duplicate_threshold=2) as inspector:
+                    self.authorized_client.get(url)
+                self.assertEqual(inspector.duplicates(), [])
+
+
+class CommentsViewTests(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.user = User.objects.create_user(username='HasNoName')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.other_post = Post.objects.create(author=self.user, text='Другой')
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=str(i))
+            for i in range(COMMENTS_ON_PAGE + 5)
+        )
+        self.other_comment = Comment.objects.create(
+            post=self.other_post, author=self.user, text='Чужой')
+
+    def test_post_detail_shows_only_own_comments(self):
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertNotIn(self.other_comment, comments)
+        self.assertIsNotNone(comments.next_cursor)
+
+    def test_load_more_comments(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        first_page = self.guest_client.get(url).context['comments']
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': first_page.next_cursor})
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 5)
+        self.assertIsNone(comments.next_cursor)
+
+
+class PostFragmentCacheTests(OnCommitMixin, TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.user = User.objects.create_user(username='HasNoName')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(author=self.user, text='Первый',
+                                        group=self.group)
+        self.url = reverse('posts:profile',
+                           kwargs={'username': self.user.username})
+        cache.clear()
+
+    def test_post_fragment_reused_until_post_changes(self):
+        self.guest_client.get(self.url)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Первый')
+
+        self.post.text = 'Исправленный'
+        self.post.save()
+        response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Исправленный')
+
+    def test_post_fragment_invalidated_on_group_change(self):
+        self.guest_client.get(self.url)
+        self.group.title = 'Новое название'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.save()
+        response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Новое название')
+
+
+class PostThumbnailTests(OnCommitMixin, TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.user = User.objects.create_user(username='HasNoName')
+        self.post = Post.objects.create(
+            author=self.user,
+            text='С картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=(
+                    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00'
+                    b'\x00\x21\xf9\x04\x01\x0a\x00\x01\x00\x2c\x00\x00'
+                    b'\x00\x00\x01\x00\x01\x00\x00\x02\x02\x4c\x01\x00'
+                    b'\x3b'
+                ),
+                content_type='image/gif',
+            ),
+        )
+        cache.clear()
+
+    @override_settings(POSTS_THUMBNAIL_WORKERS=2)
+    def test_pending_thumbnail_shows_placeholder(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'aspect-ratio')
+        self.assertNotContains(response, '<img class="card-img')
+
+    @override_settings(POSTS_THUMBNAIL_WORKERS=0)
+    def test_ready_thumbnail_has_srcset(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(url)
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, ' 320w"')
+        self.assertNotContains(response, ' 640w')
+
+    def test_ready_thumbnail_invalidates_pages(self):
+        generations = get_generations(FEED, post_generation(self.post.pk))
+        generate_thumbnail(self.post.image)
+        for old, new in zip(generations, get_generations(
+                FEED, post_generation(self.post.pk))):
+            self.assertNotEqual(old, new)
+
+    def test_ready_thumbnail_survives_cache_eviction(self):
+        picture = generate_thumbnail(self.post.image)
+        cache.clear()
+        generations = get_generations(FEED, post_generation(self.post.pk))
+        with mock.patch('posts.thumbnails._submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(schedule_thumbnail(self.post.image)['src'],
+                                 picture['src'])
+        submit.assert_not_called()
+        self.assertEqual(
+            get_generations(FEED, post_generation(self.post.pk)), generations)
+
+    @override_settings(POSTS_THUMBNAIL_WORKERS=0)
+    def test_failed_thumbnail_is_not_retried(self):
+        with mock.patch('posts.thumbnails.get_thumbnail',
+                        side_effect=OSError('битый файл')) as thumbnail:
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                self.assertIsNone(schedule_thumbnail(self.post.image))
+            cache.clear()
+            self.assertIsNone(schedule_thumbnail(self.post.image))
+        self.assertEqual(thumbnail.call_count, 1)
+        self.assertIn('битый файл', Thumbnail.objects.get(
+            image=self.post.image.name).error)
+        self.assertIsNone(get_ready_thumbnail(self.post.image))
+
+    def test_forget_thumbnail_removes_record(self):
+        generate_thumbnail(self.post.image)
+        forget_thumbnail(self.post.image.name)
+        self.assertFalse(Thumbnail.objects.exists())
+        self.assertIsNone(get_ready_thumbnail(self.post.image))
+
+
+class WriteTransactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=cls.user, text='Текст')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_get_does_not_open_transaction(self):
+        urls = (
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', args=(self.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url), CaptureQueriesContext(
+                    connection) as queries:
+                self.assertEqual(
+                    self.authorized_client.get(url).status_code, 200)
+            self.assertFalse([query for query in queries.captured_queries
+                              if query['sql'].startswith('SAVEPOINT')])
+
+    def test_post_runs_in_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.post(reverse('posts:post_create'),
+                                        {'text': 'Новый'})
+        self.assertTrue([query for query in queries.captured_queries
+                         if query['sql'].startswith('SAVEPOINT')])
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.other = User.objects.create_user(username='Other')
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Про котов')
+        cls.cat_post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Котики спят весь день')
+        cls.other_cat_post = Post.objects.create(
+            author=cls.other, text='Котики и котята, котики везде')
+        cls.dog_post = Post.objects.create(
+            author=cls.user, text='Собаки гуляют')
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return list(response.context['page_obj'])
+
+    def test_search_by_prefix_ranked(self):
+        self.assertEqual(self.search(q='котик'),
+                         [self.other_cat_post, self.cat_post])
+        self.assertEqual(self.search(q='собак'), [self.dog_post])
+        self.assertEqual(self.search(q=''), [])
+
+    def test_search_filters(self):
+        self.assertEqual(self.search(q='котики', group='cats'),
+                         [self.cat_post])
+        self.assertEqual(self.search(q='котики', author='Other'),
+                         [self.other_cat_post])
+
+    def test_index_forgets_deleted_group(self):
+        group_id = self.group.pk
+        self.group.delete()
+        self.assertEqual(get_backend().search('котики', group_id=group_id),
+                         ([], None))
+        self.assertEqual(self.search(q='котики'),
+                         [self.other_cat_post, self.cat_post])
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.create(author=self.user, text='Птицы поют')
+        post.text = 'Котики победили'
+        post.save()
+        self.assertIn(post, self.search(q='победили'))
+        post.delete()
+        self.assertEqual(self.search(q='победили'), [])
+
+    def test_api_cursor_pagination(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Много котиков {number}')
+            for number in range(25))
+        call_command('rebuild_search_index', stdout=StringIO())
+        url = reverse('posts:api_search')
+        first = self.client.get(url, {'q': 'котик'}).json()
+        second = self.client.get(
+            url, {'q': 'котик', 'cursor': first['next_cursor']}).json()
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(len(ids), 27)
+        self.assertEqual(len(set(ids)), 27)
+        self.assertIsNone(second['next_cursor'])
+
+
+class ApiViewsTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост {number}')
+            for number in range(25))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_are_paginated_by_cursor(self):
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=('group',)),
+            reverse('posts:api_profile', args=('HasNoName',)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).json()
+                second = self.client.get(
+                    url, {'cursor': first['next_cursor']}).json()
+                self.assertEqual(len(first['results']), 20)
+                self.assertEqual(len(second['results']), 5)
+                self.assertEqual(set(first['results'][0]), {
+                    'id', 'text', 'pub_date', 'author', 'group', 'image',
+                    'url'})
+
+    def test_index_is_one_query(self):
+        self.client.get(reverse('posts:api_index'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts:api_index'), {'page': 2})
+
+    def test_conditional_get(self):
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.user, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ConditionalGetTests(OnCommitMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(author=self.author, text='Текст',
+                                        group=self.group)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertNotModified(self, client, url, etag):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_pages_answer_not_modified(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=('group',)),
+            reverse('posts:profile', args=('Author',)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.assertNotModified(self.client, url, etag)
+                self.assertNotEqual(self.reader_client.get(url)['ETag'],
+                                    etag)
+
+    def test_csrf_token_change_updates_etag(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.reader_client.cookies[settings.CSRF_COOKIE_NAME] = 'old'
+        etag = self.reader_client.get(url)['ETag']
+        self.reader_client.cookies[settings.CSRF_COOKIE_NAME] = 'new'
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_changes_update_etag(self):
+        profile_url = reverse('posts:profile', args=('Author',))
+        detail_url = reverse('posts:post_detail', args=(self.post.pk,))
+        profile_etag = self.reader_client.get(profile_url)['ETag']
+        detail_etag = self.reader_client.get(detail_url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.author)
+            Comment.objects.create(post=self.post, author=self.reader,
+                                   text='Комментарий')
+
+        response = self.reader_client.get(profile_url,
+                                          HTTP_IF_NONE_MATCH=profile_etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.reader_client.get(detail_url,
+                                          HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class FeedsTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Пост для ленты')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        urls = (
+            reverse('posts:posts_feed'),
+            reverse('posts:group_feed', args=('group',)),
+            reverse('posts:profile_feed', args=('HasNoName',)),
+        )
+        post_url = reverse('posts:post_detail', args=(self.post.pk,))
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['Content-Type'],
+                                 'application/atom+xml; charset=utf-8')
+                self.assertContains(response, 'Пост для ленты')
+                self.assertContains(response, post_url)
+
+    def test_feed_is_shared_between_readers(self):
+        url = reverse('posts:posts_feed')
+        etag = self.client.get(url)['ETag']
+        reader_client = Client()
+        reader_client.force_login(self.user)
+        with self.assertNumQueries(0):
+            response = reader_client.get(url)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_feed_is_cached_until_new_post(self):
+        url = reverse('posts:posts_feed')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.user, text='Свежий пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Свежий пост')
@@ -0,0 +1,229 @@
+"""Фоновая генерация миниатюр для Post.image.
+
+Миниатюры создаются пулом потоков после загрузки картинки, а шаблоны
+выводят только уже готовые: пока миниатюры нет, показывается заглушка,
+и страница не ждёт декодирования и масштабирования изображения.
+
+Для каждой картинки создаётся набор ширин в WebP и JPEG, из которых
+браузер выбирает подходящую по srcset. Описание готового набора
+или ошибка его создания хранятся в модели Thumbnail, а кеш лишь
+избавляет от запроса к базе: вытесненная из кеша запись читается
+заново, а не создаётся повторно. Когда набор готов, страницы с этими
+постами перестают читаться из кеша, и вместо заглушки выводится
+картинка. Картинки, миниатюры которых создать не удалось, остаются
+с заглушкой до запуска warm_thumbnails.
+"""
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.images import get_image_dimensions
+from django.db import close_old_connections, connection, transaction
+from PIL import features
+from sorl.thumbnail import get_thumbnail
+
+from .cache import FEED, bump_generation, post_generation
+from .models import Post, Thumbnail
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_RATIO = (960, 339)
+THUMBNAIL_WIDTHS = (320, 640, 960, 1440)
+THUMBNAIL_FALLBACK_WIDTH = 960
+THUMBNAIL_SIZES = '(min-width: 992px) 960px, 100vw'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True, 'quality': 80}
+THUMBNAIL_VERSION = 2
+DEFAULT_WORKERS = 2
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _cache_key(name):
+    digest = hashlib.md5(name.encode()).hexdigest()
+    return f'posts:thumbnail:{THUMBNAIL_VERSION}:{digest}'
+
+
+def _get_states(names):
+    """Состояния миниатюр по именам картинок.
+
+    Состояние — описание готового набора или пустой словарь, если
+    создать миниатюры не удалось; картинок без записи в ответе нет.
+    """
+    keys = {_cache_key(name): name for name in names}
+    states = {keys[key]: state
+              for key, state in cache.get_many(keys).items()}
+    missing = [name for name in keys.values() if name not in states]
+    if missing:
+        found = {
+            thumbnail.image: json.loads(thumbnail.picture or '{}')
+            for thumbnail in Thumbnail.objects.filter(
+                image__in=missing, version=THUMBNAIL_VERSION)
+        }
+        cache.set_many({_cache_key(name): state
+                        for name, state in found.items()}, None)
+        states.update(found)
+    return states
+
+
+def _save_state(name, picture=None, error=''):
+    Thumbnail.objects.update_or_create(image=name, defaults={
+        'version': THUMBNAIL_VERSION,
+        'picture': json.dumps(picture) if picture else '',
+        'error': error,
+    })
+    cache.set(_cache_key(name), picture or {}, None)
+
+
+def get_ready_thumbnail(image):
+    """Описание готового набора миниатюр или None."""
+    if not image:
+        return None
+    return _get_states([image.name]).get(image.name) or None
+
+
+def get_ready_thumbnails(images):
+    states = _get_states(image.name for image in images if image)
+    return {name: state for name, state in states.items() if state}
+
+
+def forget_thumbnail(name):
+    """Забывает миниатюры удалённой картинки."""
+    Thumbnail.objects.filter(image=name).delete()
+    cache.delete(_cache_key(name))
+
+
+def get_formats():
+    """Форматы миниатюр, начиная с предпочтительного."""
+    if features.check('webp'):
+        return ('WEBP', 'JPEG')
+    return ('JPEG',)
+
+
+def get_widths(image):
+    """Ширины миниатюр не больше исходной картинки, но хотя бы одна."""
+    # Размеры читаем отдельным файлом: image.width оставил бы у поста
+    # закрытый файл, и следующее чтение image.file упало бы.
+    try:
+        with image.storage.open(image.name) as original_file:
+            original, _ = get_image_dimensions(original_file)
+    except (OSError, ValueError):
+        original = None
+    if not original:
+        return (THUMBNAIL_FALLBACK_WIDTH,)
+    widths = tuple(width for width in THUMBNAIL_WIDTHS if width <= original)
+    return widths or THUMBNAIL_WIDTHS[:1]
+
+
+def _geometry(width):
+    ratio_width, ratio_height = THUMBNAIL_RATIO
+    return f'{width}x{round(width * ratio_height / ratio_width)}'
+
+
+def generate_thumbnail(image):
+    """Создаёт набор миниатюр сразу и запоминает его.
+
+    Возвращает словарь: src, width и height запасной JPEG-миниатюры,
+    её srcset и список пар (MIME-тип, srcset) для более лёгких форматов.
+    """
+    widths = get_widths(image)
+    fallback_width = min(widths, key=lambda width: abs(
+        width - THUMBNAIL_FALLBACK_WIDTH))
+    picture = {'sources': []}
+    for image_format in get_formats():
+        srcset = []
+        for width in widths:
+            thumbnail = get_thumbnail(image, _geometry(width),
+                                      format=image_format,
+                                      **THUMBNAIL_OPTIONS)
+            srcset.append(f'{thumbnail.url} {width}w')
+            if image_format == 'JPEG' and width == fallback_width:
+                picture.update(src=thumbnail.url, width=thumbnail.width,
+                               height=thumbnail.height)
+        srcset = ', '.join(srcset)
+        if image_format == 'JPEG':
+            picture['srcset'] = srcset
+        else:
+            picture['sources'].append((f'image/{image_format.lower()}',
+                                       srcset))
+    _save_state(image.name, picture)
+    # Одна картинка может быть у нескольких постов, см. storage.py.
+    post_ids = Post.objects.filter(image=image.name).values_list(
+        'pk', flat=True)
+    bump_generation(FEED, *map(post_generation, post_ids))
+    return picture
+
+
+def _generate_logged(image):
+    """Создаёт миниатюры, а ошибку запоминает, чтобы не повторять её."""
+    try:
+        return generate_thumbnail(image)
+    except Exception as error:
+        logger.exception('Не удалось создать миниатюру %s', image.name)
+        _save_state(image.name, error=repr(error))
+        return None
+
+
+def _get_workers():
+    return getattr(settings, 'POSTS_THUMBNAIL_WORKERS', DEFAULT_WORKERS)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_get_workers(),
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _generate_in_background(image):
+    try:
+        _generate_logged(image)
+    finally:
+        with _lock:
+            _pending.discard(image.name)
+        close_old_connections()
+
+
+def _shares_memory_db():
+    # Потоки пула открывают свои соединения, а общую базу SQLite в памяти
+    # они блокировали бы у запроса.
+    return getattr(connection, 'is_in_memory_db', lambda: False)()
+
+
+def _submit(image):
+    if _shares_memory_db():
+        _generate_logged(image)
+        return
+    with _lock:
+        if image.name in _pending:
+            return
+        _pending.add(image.name)
+    _get_executor().submit(_generate_in_background, image)
+
+
+def schedule_thumbnail(image):
+    """Ставит миниатюру в очередь после фиксации транзакции.
+
+    Если миниатюры уже есть (та же картинка загружена повторно)
+    или POSTS_THUMBNAIL_WORKERS равен 0, возвращается их описание.
+    Картинку, для которой создать миниатюры не удалось, в очередь
+    заново не ставит.
+    """
+    if not image:
+        return None
+    state = _get_states([image.name]).get(image.name)
+    if state is not None:
+        return state or None
+    if not _get_workers():
+        return _generate_logged(image)
+    transaction.on_commit(lambda: _submit(image))
+    return None
@@ -0,0 +1,137 @@
+"""Лента подписок, материализованная при записи.
+
+Новый пост сразу раскладывается в TimelineEntry всем подписчикам
+автора, поэтому чтение ленты — один проход по индексу
+(user, -pub_date, -id) без записи. Посты авторов, у которых
+подписчиков больше FANOUT_FOLLOWERS_LIMIT, раскладываются после
+фиксации транзакции пачками по FANOUT_BATCH_SIZE подписчиков, чтобы
+публикация не держала блокировку на запись всё это время.
+"""
+from functools import partial
+
+from django.db import connections, router, transaction
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+FANOUT_FOLLOWERS_LIMIT = 5000
+BACKFILL_POSTS = 500
+FANOUT_BATCH_SIZE = 1000
+TIMELINE_LENGTH = 1000
+TIMELINE_ORDERING = ('-pub_date', '-id')
+
+
+def _is_fanned_out(author_id):
+    followers_count = (Profile.objects
+                       .filter(user_id=author_id)
+                       .values_list('followers_count', flat=True)
+                       .first())
+    return (followers_count or 0) <= FANOUT_FOLLOWERS_LIMIT
+
+
+def _add_entries(user_ids, posts):
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post.pk,
+                       pub_date=post.pub_date)
+         for user_id in user_ids for post in posts],
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _fan_out_in_batches(post):
+    last_user_id = 0
+    while True:
+        followers = list(Follow.objects
+                         .filter(author_id=post.author_id,
+                                 user_id__gt=last_user_id)
+                         .order_by('user_id')
+                         .values_list('user_id', flat=True)
+                         [:FANOUT_BATCH_SIZE])
+        if not followers:
+            return
+        _add_entries(followers, [post])
+        last_user_id = followers[-1]
+
+
+def fan_out_post(post):
+    """Записывает новый пост в ленты подписчиков автора."""
+    if not _is_fanned_out(post.author_id):
+        transaction.on_commit(partial(_fan_out_in_batches, post))
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _add_entries(followers.iterator(), [post])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту недавние посты автора после подписки."""
+    posts = (Post.objects
+             .filter(author_id=author_id)
+             .only('pk', 'pub_date')
+             .order_by('-pub_date', '-id')[:BACKFILL_POSTS])
+    _add_entries([user_id], posts)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def timeline_entries(user_id):
+    """Записи ленты читателя вместе с постами, авторами и группами."""
+    return (TimelineEntry.objects
+            .filter(user_id=user_id)
+            .select_related('post__author', 'post__group')
+            .defer('post__author__password',
+                   'post__author__email',
+                   'post__group__description'))
+
+
+def get_timeline(user):
+    return timeline_entries(user.pk)
+
+
+def entries_to_posts(entries):
+    return [entry.post for entry in entries]
+
+
+def rebuild(users=None):
+    """Заново заполняет ленты по текущим подпискам.
+
+    Последние BACKFILL_POSTS постов каждого автора раскладываются
+    подписчикам одним INSERT ... SELECT, без запроса на подписку;
+    каждому читателю достаются только TIMELINE_LENGTH самых свежих.
+    Возвращает число добавленных записей.
+    """
+    follows = Follow.objects.all()
+    if users is not None:
+        follows = follows.filter(user__in=users)
+    connection = connections[router.db_for_write(TimelineEntry)]
+    ops = connection.ops
+    follows_sql, params = (follows.order_by()
+                           .values('user_id', 'author_id')
+                           .query.sql_with_params())
+    entry_table = ops.quote_name(TimelineEntry._meta.db_table)
+    post_table = ops.quote_name(Post._meta.db_table)
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} {entry_table} '
+        f'(user_id, post_id, pub_date) '
+        f'SELECT user_id, post_id, pub_date FROM ('
+        f'SELECT follow.user_id, post.id AS post_id, post.pub_date, '
+        f'ROW_NUMBER() OVER ('
+        f'PARTITION BY follow.user_id ORDER BY post.pub_date DESC, '
+        f'post.id DESC'
+        f') AS user_position '
+        f'FROM ({follows_sql}) follow JOIN ('
+        f'SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+        f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+        f') AS position FROM {post_table}'
+        f') post ON post.author_id = follow.author_id '
+        f'WHERE post.position <= %s'
+        f') entry WHERE entry.user_position <= %s '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*params, BACKFILL_POSTS, TIMELINE_LENGTH))
+        return cursor.rowcount
@@ -2,7 +2,7 @@ from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
 
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
@@ -16,10 +16,21 @@ urlpatterns = [
     path('follow/', views.follow_index, name='follow_index'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('profile/<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('profile/<str:username>/unfollow/', views.profile_unfollow,
          name='profile_unfollow'),
+    path('search/', views.search, name='search'),
+    path('feeds/', feeds.posts_feed, name='posts_feed'),
+    path('group/<slug:slug>/feed/', feeds.group_feed, name='group_feed'),
+    path('profile/<str:username>/feed/', feeds.profile_feed,
+         name='profile_feed'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/search/', api.search, name='api_search'),
 ]
 
 if settings.DEBUG:
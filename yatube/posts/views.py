@@ -1,40 +1,107 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from core.db.replicas import read_from_replica
 
+from .cache import FEED, cache_feed
+from .counters import get_profile
+from .decorators import conditional_feed, conditional_post
+from .decorators import conditional_profile
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Comment, Follow
+from .models import Group, Post, User, Follow
+from .paginator import CursorPaginator
+from .search import get_search_params, search_posts
+from .thumbnails import schedule_thumbnail
+from .timeline import TIMELINE_ORDERING, entries_to_posts, get_timeline
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
 TITLE_POST_LENGTH = 30
+PAGE_WINDOW_SIDE = 2
+PAGE_WINDOW_ENDS = 1
 
 
-def get_paginator_context(queryset, request):
-    paginator = Paginator(queryset, POSTS_ON_PAGE)
+def get_paginator_context(queryset, request, **paginator_options):
+    paginator = CursorPaginator(queryset, POSTS_ON_PAGE, **paginator_options)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_page(page_number,
+                                  cursor=request.GET.get('cursor'))
     return {
         'page_number': page_number,
         'page_obj': page_obj,
+        'page_window': get_page_window(page_obj),
     }
 
 
-@cache_page(20 * 60)
+def get_page_window(page_obj, on_each_side=PAGE_WINDOW_SIDE,
+                    on_ends=PAGE_WINDOW_ENDS):
+    """Номера страниц для пагинатора, None обозначает пропуск.
+
+    Выводятся края и окрестность текущей страницы. Если общее
+    число записей неизвестно, правый край не показывается.
+    """
+    paginator = page_obj.paginator
+    current = page_obj.number
+    last = _get_window_last_page(page_obj, on_each_side, on_ends)
+    numbers = set(range(1, min(on_ends, last) + 1))
+    if paginator.count_is_exact:
+        numbers.update(range(max(last - on_ends + 1, 1), last + 1))
+    if current:
+        numbers.update(range(max(current - on_each_side, 1),
+                             min(current + on_each_side, last) + 1))
+    window = []
+    previous = 0
+    for number in sorted(numbers):
+        if number - previous > 1:
+            window.append(None)
+        window.append(number)
+        previous = number
+    if page_obj.next_cursor and not paginator.count_is_exact:
+        window.append(None)
+    return window
+
+
+def _get_window_last_page(page_obj, on_each_side, on_ends):
+    paginator = page_obj.paginator
+    if paginator.count is not None:
+        return paginator.num_pages
+    if not page_obj.number:
+        return on_ends
+    if page_obj.next_cursor:
+        return min(page_obj.number + on_each_side, paginator.num_pages)
+    return page_obj.number
+
+
+def get_comments_page(post, cursor=None):
+    """Свежие комментарии к посту, более старые догружаются по курсору."""
+    paginator = CursorPaginator(
+        post.comment_set.select_related('author'),
+        COMMENTS_ON_PAGE,
+        ordering=('-created', '-id'),
+        count_limit=0,
+    )
+    return paginator.get_page(1, cursor=cursor)
+
+
+@read_from_replica
+@conditional_feed
+@cache_feed(FEED)
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.all()
+    posts = Post.objects.for_feed()
     title = 'Последние обновления на сайте'
     context = {'title': title}
     context.update(get_paginator_context(posts, request))
     return render(request, template, context)
 
 
+@read_from_replica
+@conditional_feed
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.post_set.all()
+    posts = group.post_set.for_feed()
     title = f'группа {group.title}'
     context = {'group': group,
                'title': title}
@@ -42,40 +109,48 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@read_from_replica
+@conditional_profile
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author)
+    author = get_object_or_404(User.objects.select_related('profile'),
+                               username=username)
+    profile = get_profile(author)
+    posts = Post.objects.for_feed().filter(author=author)
 
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=request.user, author=author).exists()
     else:
         following = False
-    posts_count = posts.count()
+    posts_count = profile.posts_count
     title = f'Профайл пользователя {author}'
     context = {
         'title': title,
         'author': author,
+        'profile': profile,
         'posts_count': posts_count,
         'following': following
     }
-    context.update(get_paginator_context(posts, request))
+    context.update(get_paginator_context(posts, request, count=posts_count))
     return render(request, template, context)
 
 
+@read_from_replica
+@conditional_post
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
 
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), id=post_id)
     posts_fragment = post.text[:TITLE_POST_LENGTH]
     title = f'Пост {posts_fragment}'
     if request.user == post.author:
         is_edit = True
     else:
         is_edit = False
-    posts_count = Post.objects.filter(author=post.author).count()
-    comments = Comment.objects.all()
+    posts_count = get_profile(post.author).posts_count
+    comments = get_comments_page(post)
     form = CommentForm()
     context = {
         'title': title,
@@ -89,14 +164,44 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = get_comments_page(post, request.GET.get('cursor'))
+    return render(request, 'includes/comments.html',
+                  {'post': post, 'comments': comments})
+
+
+def search(request):
+    template = 'posts/search.html'
+    params = get_search_params(request.GET)
+    posts, next_cursor = search_posts(**params, limit=POSTS_ON_PAGE)
+    next_url = None
+    if next_cursor:
+        next_params = request.GET.copy()
+        next_params['cursor'] = next_cursor
+        next_url = f'?{next_params.urlencode()}'
+    title = f'Поиск: {params["query"]}' if params['query'] else 'Поиск'
+    context = {
+        'title': title,
+        'query': params['query'],
+        'author': params['author'],
+        'group': params['group'],
+        'page_obj': posts,
+        'next_url': next_url,
+    }
+    return render(request, template, context)
+
+
 @login_required(redirect_field_name='login')
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(request.POST or None, files=request.FILES or None)
         if form.is_valid():
-            post = form.save(commit=False)
-            post.author = request.user
-            post.save()
+            with transaction.atomic():
+                post = form.save(commit=False)
+                post.author = request.user
+                post.save()
+                schedule_thumbnail(post.image)
             return redirect('posts:profile', post.author)
     else:
         form = PostForm()
@@ -109,11 +214,16 @@ def post_edit(request, post_id):
         return redirect('posts:post_detail', post_id)
 
     if request.method == 'POST':
-        form = PostForm(request.POST or None, files=request.FILES or None)
+        form = PostForm(request.POST or None, files=request.FILES or None,
+                        instance=post)
         if form.is_valid():
-            post.text = form.cleaned_data['text']
-            post.group = form.cleaned_data['group']
-            post.save()
+            # Только поля формы: счётчики могли измениться, пока
+            # форма была открыта, и их нельзя перезаписать старыми.
+            with transaction.atomic():
+                post = form.save(commit=False)
+                post.save(update_fields=[*form.fields, 'updated_at'])
+                if 'image' in form.changed_data:
+                    schedule_thumbnail(post.image)
             return redirect('posts:post_detail', post_id)
     else:
         form = PostForm(instance=post)
@@ -129,19 +239,22 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    if not request.user.is_authenticated:
-        redirect('posts:index')
-    authors = Follow.objects.filter(user=request.user).values('author')
-    posts = Post.objects.filter(author__in=authors)
+    posts = get_timeline(request.user)
     title = 'Подписки'
     context = {'title': title}
-    context.update(get_paginator_context(posts, request))
+    context.update(get_paginator_context(
+        posts, request,
+        ordering=TIMELINE_ORDERING,
+        count_limit=0,
+        transform=entries_to_posts,
+    ))
     return render(request, 'posts/follow.html', context)
 
 
@@ -149,14 +262,16 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user,
-                                     author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user,
+                                         author=author)
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user,
-                          author=author).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user,
+                              author=author).delete()
     return redirect('posts:profile', username)
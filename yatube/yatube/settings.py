@@ -11,6 +11,10 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
+
+from core.cache.config import get_caches
+from core.db.config import get_database, get_replicas
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -48,7 +52,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.perf.middleware.PerformanceMiddleware',
+    'core.perf.queries.QueryInspectionMiddleware',
+    'core.perf.profiler.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db.replicas.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,7 +69,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.perf.templates.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,13 +90,16 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+# Настраивается переменными окружения DB_*, см. core/db/config.py.
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': get_database(os.environ, BASE_DIR),
 }
+DATABASES.update(get_replicas(os.environ, DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db.replicas.ReplicaRouter']
+# Сколько секунд после записи чтение идёт с основной базы.
+DATABASE_REPLICA_STICKY_SECONDS = 5
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -131,10 +142,77 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
+# Настраивается переменными окружения CACHE_*, см. core/cache/config.py.
+CACHES = get_caches(os.environ)
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Доля запросов с замерами производительности (0 — выключено, 1 — все),
+# см. core/perf. Снимки статистики процессов попадают в общий кеш
+# не чаще раза в PERFORMANCE_PUBLISH_SECONDS секунд.
+PERFORMANCE_SAMPLE_RATE = float(
+    os.environ.get('PERFORMANCE_SAMPLE_RATE', 1 if DEBUG else 0))
+PERFORMANCE_PUBLISH_SECONDS = 10
+
+# Журнал медленных (дольше QUERY_SLOW_MS) и повторяющихся (один SQL
+# QUERY_DUPLICATE_THRESHOLD раз за запрос) запросов к базе,
+# см. core/perf/queries.py и команду query_report. None — вести журнал,
+# пока включён DEBUG: тестовые запуски выключают его, и тесты не пишут
+# в общий журнал.
+QUERY_INSPECTION_ENABLED = {'1': True, '0': False}.get(
+    os.environ.get('QUERY_INSPECTION_ENABLED'))
+QUERY_SLOW_MS = int(os.environ.get('QUERY_SLOW_MS', 100))
+QUERY_DUPLICATE_THRESHOLD = 3
+QUERY_LOG_FILE = os.environ.get(
+    'QUERY_LOG_FILE',
+    os.path.join(tempfile.gettempdir(), 'yatube-queries.log'),
+)
+
+# Выборочное профилирование: в среднем каждый PROFILING_ONE_IN-й запрос
+# (0 — только с заголовком из команды profile_token). Свёрнутые стеки
+# для flame graph пишутся в PROFILING_DIR, см. core/perf/profiler.py.
+PROFILING_ONE_IN = int(os.environ.get('PROFILING_ONE_IN', 0))
+PROFILING_INTERVAL = 0.005
+PROFILING_DIR = os.environ.get(
+    'PROFILING_DIR',
+    os.path.join(tempfile.gettempdir(), 'yatube-profiles'),
+)
+PROFILING_HEADER = 'X-Yatube-Profile'
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': QUERY_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.perf.queries': {
+            'handlers': ['queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Сколько потоков создают миниатюры картинок постов в фоне;
+# 0 — создавать миниатюру сразу при первом показе.
+POSTS_THUMBNAIL_WORKERS = 2
+
+# Ограничения для картинок постов: загрузки больше POSTS_IMAGE_MAX_BYTES
+# или POSTS_IMAGE_MAX_PIXELS отклоняются, остальные уменьшаются до
+# POSTS_IMAGE_MAX_DIMENSION по большей стороне.
+POSTS_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POSTS_IMAGE_MAX_PIXELS = 40_000_000
+POSTS_IMAGE_MAX_DIMENSION = 2048
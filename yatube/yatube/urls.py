@@ -23,5 +23,6 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('perf/', include('core.urls', namespace='core')),
     path('', include('posts.urls')),
 ]